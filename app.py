@@ -2,7 +2,17 @@ import streamlit as st
 import requests
 import os
 import json
+import uuid
 from dotenv import load_dotenv
+from utils.chat_stream import GROQ_CHAT_URL, iter_completion_tokens, open_chat_stream
+from models.registry import get_embedding_model, get_response_cache, get_scheduler
+from models.scheduler import RateLimitExceeded, request_tokens, retry_after
+from utils.orchestrator import assemble_context, gather_context
+from utils.rag_utils import file_digest, process_documents
+from utils.portfolio_csv import format_portfolio_summary, is_csv_file, summarize_csv
+from utils.conversation import ConversationWindow
+from utils.tokens import estimate_tokens
+from config.config import load_config
 
 # Try to load from .env file for local development
 load_dotenv()
@@ -10,6 +20,21 @@ load_dotenv()
 # --- Streamlit Page Config ---
 st.set_page_config(page_title="NeoFinancial Advisor", layout="wide")
 
+MODEL_NAME = "llama-3.1-8b-instant"
+
+SYSTEM_PROMPT = """You are NeoFinancial Advisor, a helpful AI financial expert. 
+                        Provide accurate, helpful advice about investments, markets, and portfolio management.
+                        Be clear and concise in your responses."""
+
+# Shared by every session in this process (see models/registry.py)
+response_cache = get_response_cache()
+config = load_config()
+
+# Each session indexes and searches only its own uploads
+if "namespace" not in st.session_state:
+    st.session_state.namespace = uuid.uuid4().hex
+embedding_model = get_embedding_model(namespace=st.session_state.namespace)
+
 # --- Sidebar Configuration ---
 with st.sidebar:
     st.header("⚙️ Configuration")
@@ -41,9 +66,44 @@ with st.sidebar:
         accept_multiple_files=True
     )
 
+    # Index each upload once per content hash; reruns only hash the bytes
+    if "indexed_files" not in st.session_state:
+        st.session_state.indexed_files = {}
+        st.session_state.portfolio_summaries = {}
     if uploaded_files:
+        digests = {f.name: file_digest(f.getvalue()) for f in uploaded_files}
+        pending = [f for f in uploaded_files if st.session_state.indexed_files.get(f.name) != digests[f.name]]
+        # CSV exports are aggregated into a compact summary instead of indexing raw rows
+        for f in [f for f in pending if is_csv_file(f)]:
+            with st.spinner(f"Summarizing {f.name}..."):
+                summary = summarize_csv(f)
+            if summary:
+                st.session_state.portfolio_summaries[f.name] = format_portfolio_summary(summary, f.name)
+            st.session_state.indexed_files[f.name] = digests[f.name]
+        pending = [f for f in pending if not is_csv_file(f)]
+        if pending:
+            progress = st.progress(0.0, text="Indexing documents...")
+            stats = process_documents(
+                pending,
+                embedding_model,
+                progress_callback=lambda done, total, name: progress.progress(done / total, text=f"Indexed {name}"),
+            )
+            progress.empty()
+            for f in pending:
+                st.session_state.indexed_files[f.name] = digests[f.name]
+            st.session_state.index_stats = stats
         st.success(f"{len(uploaded_files)} file(s) uploaded")
 
+    if embedding_model.current.n_live:
+        status = f"📚 {embedding_model.current.n_live} chunks indexed"
+        stats = st.session_state.get("index_stats")
+        if stats:
+            status += (f" · last upload: {stats['files']} new, {stats['skipped']} unchanged,"
+                       f" {stats['chunks']} chunks in {stats['seconds']:.1f}s")
+        st.caption(status)
+    if st.session_state.portfolio_summaries:
+        st.caption(f"📈 Portfolio data from {len(st.session_state.portfolio_summaries)} CSV file(s)")
+
 # --- Main App UI ---
 st.title("💰 NeoFinancial Advisor")
 
@@ -52,6 +112,9 @@ if not api_key:
     st.error("❌ Please enter your Groq API key in the sidebar to continue.")
     st.stop()
 
+# Every session using this key shares one requests/min and tokens/min budget
+scheduler = get_scheduler(api_key)
+
 # Keep chat history
 if "messages" not in st.session_state:
     st.session_state.messages = [{
@@ -59,6 +122,13 @@ if "messages" not in st.session_state:
         "content": "Hello! I'm your NeoFinancial Advisor. How can I help with your investments, markets, or portfolio questions today?"
     }]
 
+# Token counts and the summary of older turns carry over between reruns
+if "context_window" not in st.session_state:
+    st.session_state.context_window = ConversationWindow(
+        budget_tokens=config["context_budget_tokens"],
+        summary_tokens=config["context_summary_tokens"],
+    )
+
 # --- Display chat history ---
 for msg in st.session_state.messages:
     st.chat_message(msg["role"]).write(msg["content"])
@@ -69,60 +139,104 @@ if prompt := st.chat_input("Ask about investments, markets, or portfolio advice"
     st.session_state.messages.append({"role": "user", "content": prompt})
     st.chat_message("user").write(prompt)
 
-    # Call Groq API with loading spinner
-    with st.spinner("🤖 Thinking..."):
-        try:
-            # Groq API endpoint
-            API_URL = "https://api.groq.com/openai/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            # Prepare messages for the API - include system message and conversation history
-            messages = [
-                {
-                    "role": "system", 
-                    "content": """You are NeoFinancial Advisor, a helpful AI financial expert. 
-                    Provide accurate, helpful advice about investments, markets, and portfolio management.
-                    Be clear and concise in your responses."""
+    # Stream the Groq completion token by token into the assistant bubble
+    with st.chat_message("assistant"):
+        # Retrieval runs on a worker thread under a deadline, so a slow index
+        # delays the answer by at most retrieval_deadline seconds
+        document_context = None
+        if embedding_model.current.n_live:
+            with st.spinner("📚 Searching your documents..."):
+                gathered = gather_context(
+                    prompt, embedding_model, use_web_search=False,
+                    retrieval_deadline=config["retrieval_deadline"],
+                )
+            document_context = assemble_context(gathered, max_chars=config["rag_context_chars"])
+
+        # Answers depend on the conversation and retrieved context, so both are part of the cache key
+        cache_context = "\n".join(msg["content"] for msg in st.session_state.messages[:-1])
+        portfolio_context = "\n\n".join(st.session_state.portfolio_summaries.values())
+        if document_context:
+            cache_context += "\n" + document_context
+        if portfolio_context:
+            cache_context += "\n" + portfolio_context
+        cached_answer = response_cache.get(prompt, response_mode, MODEL_NAME, cache_context)
+
+        streamed = False
+        answer = cached_answer
+        if cached_answer is None:
+            ticket = None
+            # Tokens the provider charged so far; a ticket not settled below is settled with this
+            charged = 0
+            try:
+                # Prepare messages for the API - system message plus as much recent
+                # history as fits the token budget; older turns are summarized
+                messages = st.session_state.context_window.build(SYSTEM_PROMPT, st.session_state.messages)
+                if document_context:
+                    messages.insert(1, {
+                        "role": "system",
+                        "content": "Use these excerpts from the user's uploaded documents where relevant:\n\n" + document_context,
+                    })
+                if portfolio_context:
+                    messages.insert(1, {
+                        "role": "system",
+                        "content": "The user's portfolio, computed from their uploaded CSV exports:\n\n" + portfolio_context,
+                    })
+                
+                payload = {
+                    "model": MODEL_NAME,
+                    "messages": messages,
+                    "temperature": 0.7,
+                    "max_tokens": 1024,
+                    "top_p": 1,
                 }
-            ]
-            
-            # Add conversation history (recent messages to maintain context)
-            for msg in st.session_state.messages[-6:]:  # Keep last 6 messages for context
-                messages.append({"role": msg["role"], "content": msg["content"]})
-            
-            payload = {
-                "model": "llama-3.1-8b-instant",
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 1024,
-                "top_p": 1,
-            }
-            
-            response = requests.post(API_URL, headers=headers, json=payload, timeout=60)
-            
-            # Check if response is successful
-            if response.status_code == 200:
-                result = response.json()
-                answer = result["choices"][0]["message"]["content"]
-            else:
-                st.error(f"API Error {response.status_code}")
-                answer = f"I'm having trouble connecting to the financial analysis system. Error: {response.status_code}"
-                if response.status_code == 401:
-                    answer += " - Please check your API key is correct."
-
-        except requests.exceptions.Timeout:
-            answer = "⚠️ Request timed out. The financial markets are busy right now. Please try again."
-        except requests.exceptions.ConnectionError:
-            answer = "⚠️ Connection error. Please check your internet connection and try again."
-        except Exception as e:
-            answer = f"❌ An unexpected error occurred: {str(e)}"
+                
+                # Queue behind other sessions instead of running into the provider's 429s
+                tokens = request_tokens(messages, payload["max_tokens"])
+                wait = scheduler.estimate_wait(tokens)
+                if wait >= 1:
+                    st.info(f"⏳ High demand right now: your question is queued (about {wait:.0f}s).")
+                # The spinner only covers the queue and the wait for response headers
+                with st.spinner("🤖 Thinking..."):
+                    ticket = scheduler.acquire(tokens)
+                    response = open_chat_stream(api_key, payload, api_url=GROQ_CHAT_URL, timeout=60)
+                
+                # Check if response is successful
+                if response.status_code == 200:
+                    charged = tokens - payload["max_tokens"]
+                    with response:
+                        answer = st.write_stream(iter_completion_tokens(response.iter_lines()))
+                    streamed = True
+                    scheduler.settle(ticket, charged + estimate_tokens(answer))
+                    ticket = None
+                    response_cache.put(prompt, response_mode, MODEL_NAME, answer, cache_context)
+                else:
+                    if response.status_code == 429:
+                        scheduler.backoff(retry_after(response))
+                    st.error(f"API Error {response.status_code}")
+                    answer = f"I'm having trouble connecting to the financial analysis system. Error: {response.status_code}"
+                    if response.status_code == 401:
+                        answer += " - Please check your API key is correct."
+                    response.close()
+
+            except RateLimitExceeded as e:
+                answer = (f"⏳ The advisor is handling too many requests right now. "
+                          f"Please try again in about {e.wait:.0f} seconds.")
+            except requests.exceptions.Timeout:
+                answer = "⚠️ Request timed out. The financial markets are busy right now. Please try again."
+            except requests.exceptions.ConnectionError:
+                answer = "⚠️ Connection error. Please check your internet connection and try again."
+            except Exception as e:
+                answer = f"❌ An unexpected error occurred: {str(e)}"
+            finally:
+                if ticket is not None:
+                    # A failed call hands back the part of its reservation it never used
+                    scheduler.settle(ticket, charged)
+
+        if not streamed:
+            st.write(answer)
 
     # Store assistant message
     st.session_state.messages.append({"role": "assistant", "content": answer})
-    st.chat_message("assistant").write(answer)
 
 # Add a footer with info
 st.sidebar.markdown("---")
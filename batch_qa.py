@@ -0,0 +1,163 @@
+# batch_qa.py
+# Usage: python batch_qa.py questions.jsonl answers.jsonl [--concurrency 8] [--namespace NAME]
+#
+# Each input line is {"id": ..., "question": ..., "context": ..., "response_mode": ...}
+# (only "question" is required; a bare JSON string works too). Each output line
+# holds the answer, the backend that produced it, token usage and latencies.
+# The output file is the checkpoint: rerunning the same command skips every id
+# already answered without error, so an interrupted run picks up where it stopped.
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config.config import load_config
+from models.registry import get_chat_model, get_embedding_model
+from models.scheduler import BATCH
+from utils.orchestrator import assemble_context, gather_context
+
+
+def read_questions(path):
+    """Yield (id, item) per JSONL line; the id defaults to the line number"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"question": item}
+            yield str(item.get("id", line_number)), item
+
+
+def load_checkpoint(path):
+    """Ids already answered in path (the last record per id wins).
+
+    A line cut short by a crash is truncated away so appending can resume.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r+b') as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("error") is None:
+            done.add(str(record["id"]))
+        else:
+            done.discard(str(record["id"]))
+    return done
+
+
+def answer_one(item_id, item, chat_model, embedding_model, args, config):
+    start = time.perf_counter()
+    record = {"id": item_id, "question": item.get("question"), "answer": None, "backend": None,
+              "cached": False, "usage": None, "latency": {}, "error": None}
+    try:
+        question = item["question"]
+        context = item.get("context")
+        if embedding_model is not None or args.web_search:
+            gathered = gather_context(
+                question, embedding_model, use_web_search=args.web_search,
+                retrieval_deadline=args.retrieval_deadline,
+            )
+            retrieved = assemble_context(gathered, max_chars=config["rag_context_chars"])
+            context = "\n\n".join(part for part in (context, retrieved) if part) or None
+            record["latency"]["retrieval"] = gathered["timings"]["context_total"]["seconds"]
+            record["retrieval_status"] = {
+                stage: timing["status"] for stage, timing in gathered["timings"].items() if stage != "context_total"
+            }
+
+        llm_start = time.perf_counter()
+        result = chat_model.generate_response_detailed(
+            question, context, item.get("response_mode", args.mode), priority=BATCH,
+        )
+        record["latency"]["llm"] = time.perf_counter() - llm_start
+        record.update(answer=result["answer"], backend=result["backend"], cached=result["cached"],
+                      usage=result["usage"], error=result["error"])
+    except Exception as e:
+        record["error"] = str(e)
+    record["latency"]["total"] = time.perf_counter() - start
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with retrieval and the LLM")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--concurrency", type=int, default=8, help="questions in flight at once")
+    parser.add_argument("--mode", default="concise", choices=["concise", "detailed"])
+    parser.add_argument("--model", default=None, help="override MODEL_NAME")
+    parser.add_argument("--namespace", default=None, help="document index to search (default: the shared one)")
+    parser.add_argument("--no-retrieval", action="store_true")
+    parser.add_argument("--web-search", action="store_true")
+    # Nobody is watching a spinner, so retrieval gets far longer than in the UI
+    parser.add_argument("--retrieval-deadline", type=float, default=10.0)
+    args = parser.parse_args()
+
+    config = load_config()
+    chat_model = get_chat_model(model_name=args.model)
+    embedding_model = None
+    if not args.no_retrieval:
+        embedding_model = get_embedding_model(namespace=args.namespace)
+        if not embedding_model.current.n_live:
+            embedding_model = None
+
+    done = load_checkpoint(args.output)
+    if done:
+        print(f"Resuming: {len(done)} question(s) already answered in {args.output}")
+
+    records = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool, \
+            open(args.output, 'a', encoding='utf-8') as out:
+
+        def write(finished):
+            for future in finished:
+                record = future.result()
+                out.write(json.dumps(record) + "\n")
+                # One flushed line per answer is the checkpoint
+                out.flush()
+                records.append(record)
+                if len(records) % 50 == 0:
+                    rate = len(records) / (time.perf_counter() - start)
+                    print(f"{len(records)} answered ({rate:.1f}/s)", file=sys.stderr)
+
+        # Only a couple of questions per worker are queued, so huge inputs stream through
+        pending = set()
+        for item_id, item in read_questions(args.input):
+            if item_id in done:
+                continue
+            done.add(item_id)
+            if len(pending) >= 2 * args.concurrency:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write(finished)
+            pending.add(pool.submit(answer_one, item_id, item, chat_model, embedding_model, args, config))
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            write(finished)
+        os.fsync(out.fileno())
+
+    seconds = time.perf_counter() - start
+    if not records:
+        print("Nothing to do.")
+        return
+    errors = sum(1 for record in records if record["error"])
+    latencies = sorted(record["latency"]["total"] for record in records)
+    tokens = sum((record["usage"] or {}).get("total_tokens", 0) for record in records)
+    print(f"{len(records)} answered ({errors} errors) in {seconds:.1f}s = {len(records) / seconds:.2f} questions/sec")
+    print(f"latency median {statistics.median(latencies):.2f}s, "
+          f"p95 {latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]:.2f}s; {tokens:,} tokens")
+
+
+if __name__ == "__main__":
+    main()
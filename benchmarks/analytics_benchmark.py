@@ -0,0 +1,29 @@
+# benchmarks/analytics_benchmark.py
+# Usage: python benchmarks/analytics_benchmark.py [--paths 10000] [--years 30] [--workers 4]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.portfolio_analytics import monte_carlo_retirement
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo retirement projection timing")
+    parser.add_argument("--paths", type=int, default=10000)
+    parser.add_argument("--years", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    for label, workers in (("one core", 1), (f"{args.workers} workers", args.workers)):
+        start = time.perf_counter()
+        result = monte_carlo_retirement(250000, 15000, years=args.years, n_paths=args.paths, seed=0, max_workers=workers)
+        seconds = time.perf_counter() - start
+        print(f"{label:>12}: {args.paths:,} paths x {args.years} years in {seconds * 1000:.0f} ms "
+              f"(median ${result['final_median']:,.0f}, success {result['success_rate']:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bm25_benchmark.py
+# Usage: python benchmarks/bm25_benchmark.py [--chunks 1000000] [--queries 200]
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.bm25_index import BM25Index
+
+VOCABULARY = 20000
+
+
+def make_chunks(n_chunks, seed=0):
+    """Zipf-distributed words plus a rare identifier (ticker/CUSIP-like) in every 50th chunk"""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"term{i}" for i in range(VOCABULARY)])
+    ranks = np.minimum(rng.zipf(1.2, size=(n_chunks, 40)), VOCABULARY) - 1
+    chunks = [" ".join(row) for row in words[ranks]]
+    identifiers = []
+    for i in range(0, n_chunks, 50):
+        identifier = f"{rng.integers(10 ** 8, 10 ** 9)}"
+        chunks[i] += " cusip " + identifier
+        identifiers.append(identifier)
+    return chunks, identifiers
+
+
+def time_queries(index, queries, top_k):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, top_k)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[int(0.95 * (len(latencies) - 1))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 build time and top-k query latency")
+    parser.add_argument("--chunks", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"Generating {args.chunks:,} chunks...")
+    chunks, identifiers = make_chunks(args.chunks)
+
+    start = time.perf_counter()
+    index = BM25Index()
+    for i in range(0, len(chunks), 100000):
+        index.add(chunks[i:i + 100000])
+    index.search("term1", 1)  # merges segments and computes score bounds
+    print(f"built in {time.perf_counter() - start:.1f}s: {len(index.post_docs):,} postings, {index.n_terms:,} terms")
+
+    rng = np.random.default_rng(1)
+    workloads = {
+        "identifier": list(rng.choice(identifiers, args.queries)),
+        "identifier + common words": [f"cusip {i} term0 term3" for i in rng.choice(identifiers, args.queries)],
+        "mid-frequency words": [f"term{a} term{b}" for a, b in rng.integers(50, 500, (args.queries, 2))],
+        "common words": [f"term{a} term{b} term{c}" for a, b, c in rng.integers(0, 10, (args.queries, 3))],
+    }
+    for label, queries in workloads.items():
+        median, p95 = time_queries(index, queries, args.top_k)
+        print(f"{label:>26}: median {median:.3f} ms, p95 {p95:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/chunking_check.py
+# Usage: python benchmarks/chunking_check.py
+#
+# Checks sentence splitting and chunk overlap on filing-style text with
+# figures and abbreviations. Exits non-zero on failure.
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.rag_utils import _iter_sentences, chunk_pages, estimate_tokens
+
+FILING = (
+    "Net sales for the U.S. segment were $12.45 billion, up 3.8% of sales compared with fiscal 2022. "
+    "Apple Inc. and its subsidiaries recorded gross margin of 44.1 percent, partially offset by a stronger U.S. dollar. "
+    "Operating expenses grew 2.5% as research and development headcount increased in the U.K. and Ireland. "
+)
+
+
+def check_sentences():
+    text = "Revenue was $12.45 billion, up 3.8% of sales. The U.S. economy grew. Apple Inc. reported results. Did it? Yes!"
+    sentences = [text[start:end] for start, end in _iter_sentences(text)]
+    expected = [
+        "Revenue was $12.45 billion, up 3.8% of sales.",
+        "The U.S. economy grew.",
+        "Apple Inc. reported results.",
+        "Did it?",
+        "Yes!",
+    ]
+    assert sentences == expected, sentences
+    print(f"sentences: {len(sentences)} split correctly around decimals and abbreviations")
+
+
+def check_chunks():
+    text = FILING * 10
+    chunks = list(chunk_pages([(1, text)], max_tokens=128, overlap_tokens=16))
+    # No chunk may start or end inside a figure or an abbreviation
+    figures = [match.span() for match in re.finditer(r"\$?\d+\.\d+%?|(?:[A-Z]\.){2,}", text)]
+    for chunk in chunks:
+        for start, end in figures:
+            assert not start < chunk.start < end and not start < chunk.end < end, chunk.text
+        assert estimate_tokens(chunk.text) <= 128
+    overlapping = sum(1 for previous, chunk in zip(chunks, chunks[1:]) if chunk.start < previous.end)
+    on_sentence = sum(1 for chunk in chunks[1:] if chunk.text[0].isupper())
+    assert overlapping == len(chunks) - 1
+    assert on_sentence == len(chunks) - 1
+    print(f"chunks: {len(chunks)}, all {overlapping} adjacent pairs overlap and every chunk starts on a sentence")
+
+    long_run = list(chunk_pages([(1, "x" * 3000 + " tail words here.")], max_tokens=64))
+    assert max(estimate_tokens(chunk.text) for chunk in long_run) <= 64
+    print(f"unbroken run: split into {len(long_run)} chunks of at most 64 tokens")
+
+
+def main():
+    check_sentences()
+    check_chunks()
+    print("all chunking checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/csv_benchmark.py
+# Usage: python benchmarks/csv_benchmark.py [--rows 1000000] [--chunk-rows 50000]
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.portfolio_csv import PortfolioAggregator, format_portfolio_summary, iter_csv_blocks
+
+ASSET_CLASSES = ["Equity", "Bonds", "ETF", "Cash", "REIT"]
+
+
+def write_transactions(path, rows, symbols=500, seed=0):
+    """Synthetic brokerage export: buys, sells and dividends across symbols"""
+    rng = np.random.default_rng(seed)
+    names = [f"SYM{i:03d}" for i in range(symbols)]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Action", "Symbol", "Quantity", "Price", "Fees & Comm", "Amount", "Asset Class"])
+        for start in range(0, rows, 100000):
+            n = min(100000, rows - start)
+            symbol = rng.integers(0, symbols, n)
+            action = rng.choice(["Buy", "Sell", "Qualified Dividend"], n, p=[0.6, 0.3, 0.1])
+            quantity = rng.integers(1, 100, n)
+            price = rng.uniform(5, 500, n).round(2)
+            for i in range(n):
+                amount = quantity[i] * price[i] * (-1 if action[i] == "Buy" else 1)
+                writer.writerow([
+                    "2024-01-02", action[i], names[symbol[i]], quantity[i], price[i], "0.65",
+                    f"{amount:.2f}", ASSET_CLASSES[symbol[i] % len(ASSET_CLASSES)],
+                ])
+
+
+def summarize(path, chunk_rows):
+    aggregator = PortfolioAggregator()
+    with open(path, "rb") as f:
+        for block in iter_csv_blocks(f, chunk_rows):
+            aggregator.add(block)
+    return aggregator.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tabular CSV ingestion throughput and peak memory")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--chunk-rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "transactions.csv")
+    print(f"Writing {args.rows:,} rows...")
+    write_transactions(path, args.rows)
+    size_mb = os.path.getsize(path) / 1e6
+
+    start = time.perf_counter()
+    summary = summarize(path, args.chunk_rows)
+    seconds = time.perf_counter() - start
+
+    # Separate traced run: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    summarize(path, args.chunk_rows)
+    peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+
+    print(f"{args.rows:,} rows ({size_mb:.0f} MB) in {seconds:.2f}s = {args.rows / seconds:,.0f} rows/sec")
+    print(f"peak Python allocations {peak_mb:.1f} MB with {args.chunk_rows:,}-row blocks")
+    print()
+    print(format_portfolio_summary(summary, max_holdings=5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/http_benchmark.py
+# Usage: python benchmarks/http_benchmark.py [--requests 200]
+# Compares a fresh connection per call with the pooled keep-alive client
+# against a local stub server (plain TCP, so TLS savings come on top).
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import http_client
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _time_calls(send, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        send().json()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request latency: fresh vs pooled connections")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+    payload = {"messages": [{"role": "user", "content": "hi"}]}
+
+    p50, p95 = _time_calls(lambda: requests.post(url, json=payload, timeout=10), args.requests)
+    print(f"fresh connection: p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+    p50, p95 = _time_calls(lambda: http_client.post(url, json=payload), args.requests)
+    print(f"pooled session:   p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+    for host, stats in http_client.connection_stats().items():
+        print(f"{host}: {stats['requests']} requests over {stats['connections']} connection(s), reuse {stats['reuse_ratio']:.1%}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/rate_limit_simulation.py
+# Usage: python benchmarks/rate_limit_simulation.py [--batch 60] [--interactive 10] [--speedup 60]
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.scheduler import BATCH, INTERACTIVE, RateLimitExceeded, RequestScheduler
+
+
+class FastClock:
+    """Simulated seconds that run speedup times faster than real ones"""
+
+    def __init__(self, speedup):
+        self.speedup = speedup
+        self.start = time.monotonic()
+
+    def __call__(self):
+        return (time.monotonic() - self.start) * self.speedup
+
+    def sleep(self, seconds):
+        time.sleep(seconds / self.speedup)
+
+    def wait(self, condition, timeout):
+        condition.wait(None if timeout is None else timeout / self.speedup)
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = None
+
+
+class FakeProvider:
+    """Enforces requests/min and tokens/min over a sliding minute like the real API"""
+
+    def __init__(self, clock, requests_per_minute, tokens_per_minute, latency=1.5):
+        self.clock = clock
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.latency = latency
+        self.window = deque()
+        self.lock = threading.Lock()
+        self.rejected = 0
+
+    def complete(self, tokens):
+        with self.lock:
+            now = self.clock()
+            while self.window and self.window[0][0] <= now - 60:
+                self.window.popleft()
+            if (len(self.window) >= self.requests_per_minute
+                    or sum(used for _, used in self.window) + tokens > self.tokens_per_minute):
+                self.rejected += 1
+                raise ProviderError(429)
+            self.window.append((now, tokens))
+        self.clock.sleep(self.latency)
+        return tokens
+
+
+def simulate(label, batch, interactive, speedup, scheduled):
+    clock = FastClock(speedup)
+    provider = FakeProvider(clock, requests_per_minute=30, tokens_per_minute=6000)
+    scheduler = RequestScheduler(30, 6000, max_wait=120, clock=clock, wait=clock.wait)
+    results = {INTERACTIVE: [], BATCH: []}
+    failures = {INTERACTIVE: 0, BATCH: 0}
+
+    def request(priority, tokens, arrival):
+        clock.sleep(max(0.0, arrival - clock()))
+        start = clock()
+        try:
+            if scheduled:
+                scheduler.run(lambda: provider.complete(tokens), tokens, priority, usage=lambda used: used)
+            else:
+                provider.complete(tokens)
+            results[priority].append(clock() - start)
+        except (ProviderError, RateLimitExceeded):
+            failures[priority] += 1
+
+    # A batch job floods the queue at t=0; chat users arrive while it runs
+    jobs = [(BATCH, 150, 0.0) for _ in range(batch)]
+    jobs += [(INTERACTIVE, 250, 20.0 + 10 * i) for i in range(interactive)]
+    started = clock()
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        for job in jobs:
+            pool.submit(request, *job)
+    elapsed = clock() - started
+
+    print(f"{label}: {elapsed:.0f} simulated s, provider 429s: {provider.rejected}")
+    for priority, name in ((INTERACTIVE, "interactive"), (BATCH, "batch")):
+        latencies = results[priority]
+        median = f"{statistics.median(latencies):.1f}s" if latencies else "-"
+        print(f"  {name:>11}: {len(latencies)} ok, {failures[priority]} failed, median latency {median}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queueing vs. 429s under a 30 req/min, 6000 tokens/min limit")
+    parser.add_argument("--batch", type=int, default=60)
+    parser.add_argument("--interactive", type=int, default=10)
+    parser.add_argument("--speedup", type=float, default=60.0)
+    args = parser.parse_args()
+
+    simulate("direct calls", args.batch, args.interactive, args.speedup, scheduled=False)
+    simulate("scheduled   ", args.batch, args.interactive, args.speedup, scheduled=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/scheduler_check.py
+# Usage: python benchmarks/scheduler_check.py
+#
+# Deterministic checks of RequestScheduler on a fake clock: simulated time
+# only moves when the ticket at the head of the queue waits for its budget,
+# so the results do not depend on machine speed. Exits non-zero on failure.
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.rate_limit_simulation import FakeProvider, ProviderError
+from models.scheduler import BATCH, INTERACTIVE, RateLimitExceeded, RequestScheduler
+
+
+class FakeClock:
+    """Simulated seconds; frozen until start(), then advanced by whoever waits with a timeout"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.running = False
+
+    def __call__(self):
+        return self.now
+
+    def start(self):
+        self.running = True
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def wait(self, condition, timeout):
+        if timeout is None or not self.running:
+            # A real, short wait lets the other threads queue up or be notified
+            condition.wait(0.001)
+            return
+        # A real clock always moves on; float rounding can leave a ~1e-13s timeout
+        self.now += max(timeout, 1e-6)
+
+
+def enqueue(scheduler, jobs, results=None):
+    """Submit (tokens, priority) jobs one at a time while the clock is frozen.
+
+    Each job's estimate_wait at submission and its ticket land in results.
+    Returns the acquiring threads.
+    """
+    results = [None] * len(jobs) if results is None else results
+    threads = []
+    for i, (tokens, priority) in enumerate(jobs):
+        estimate = scheduler.estimate_wait(tokens, priority)
+        submitted = scheduler.granted + len(scheduler._queue)
+
+        def acquire(i=i, tokens=tokens, priority=priority, estimate=estimate):
+            results[i] = (estimate, scheduler.acquire(tokens, priority))
+
+        thread = threading.Thread(target=acquire, daemon=True)
+        thread.start()
+        threads.append(thread)
+        while scheduler.granted + len(scheduler._queue) <= submitted:
+            time.sleep(0.001)
+    return threads
+
+
+def check_estimate_covers_backlog():
+    """estimate_wait must count every ticket ahead, not just one bucket's worth"""
+    clock = FakeClock()
+    scheduler = RequestScheduler(30, 6000, max_wait=float("inf"), clock=clock, wait=clock.wait)
+    results = [None] * 20
+    threads = enqueue(scheduler, [(1200, INTERACTIVE)] * 20, results)
+    clock.start()
+    for thread in threads:
+        thread.join()
+    for i, (estimate, ticket) in enumerate(results):
+        assert abs(estimate - ticket.granted_at) <= 1.0, f"ticket {i}: estimated {estimate:.1f}s, granted at {ticket.granted_at:.1f}s"
+    print(f"estimate: last of 20 x 1200-token tickets estimated {results[-1][0]:.0f}s, granted at {results[-1][1].granted_at:.0f}s")
+
+
+def check_rejects_when_queue_too_long():
+    clock = FakeClock()
+    scheduler = RequestScheduler(30, 6000, max_wait=30, clock=clock, wait=clock.wait)
+    enqueue(scheduler, [(1200, BATCH)] * 5)
+    # Interactive requests skip the batch backlog, so only batch estimates grow with it
+    assert scheduler.estimate_wait(1200, INTERACTIVE) < scheduler.estimate_wait(1200, BATCH)
+    enqueue(scheduler, [(1200, INTERACTIVE)] * 2)
+    try:
+        scheduler.acquire(1200, INTERACTIVE)
+    except RateLimitExceeded as e:
+        print(f"backpressure: rejected with an estimated wait of {e.wait:.0f}s (max_wait 30s)")
+    else:
+        raise AssertionError("a request behind a 30s+ backlog was not rejected")
+
+
+def check_priority_and_no_429s():
+    """Against a provider enforcing the same limits, queued calls never see a 429"""
+    clock = FakeClock()
+    provider = FakeProvider(clock, requests_per_minute=30, tokens_per_minute=6000, latency=0)
+    scheduler = RequestScheduler(30, 6000, max_wait=float("inf"), clock=clock, wait=clock.wait)
+    jobs = [(150, BATCH)] * 30 + [(250, INTERACTIVE)] * 5
+    order = []
+
+    def call(tokens, priority):
+        ticket = scheduler.acquire(tokens, priority)
+        try:
+            provider.complete(tokens)
+        except ProviderError:
+            scheduler.backoff(60)
+        order.append(priority)
+        scheduler.settle(ticket, tokens)
+
+    threads = []
+    for tokens, priority in jobs:
+        submitted = scheduler.granted + len(scheduler._queue)
+        threads.append(threading.Thread(target=call, args=(tokens, priority)))
+        threads[-1].start()
+        while scheduler.granted + len(scheduler._queue) <= submitted:
+            time.sleep(0.001)
+    clock.start()
+    for thread in threads:
+        thread.join()
+    assert provider.rejected == 0, f"{provider.rejected} provider 429s"
+    # A few batch calls fit the initial burst; every queued interactive call goes before the rest
+    first_interactive = order.index(INTERACTIVE)
+    assert order[first_interactive:first_interactive + 5] == [INTERACTIVE] * 5, order
+    print(f"fake provider: {len(jobs)} calls in {clock():.0f} simulated s, 0 429s, interactive served first")
+
+
+def main():
+    check_estimate_covers_backlog()
+    check_rejects_when_queue_too_long()
+    check_priority_and_no_429s()
+    print("all scheduler checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/startup_benchmark.py
+# Usage: python benchmarks/startup_benchmark.py [--runs 5]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["sklearn", "scipy", "groq", "PyPDF2", "docx", "faiss", "sentence_transformers"]
+
+# Each measurement runs in a fresh interpreter so nothing is already imported
+IMPORT_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import models.registry, utils.orchestrator, utils.conversation, utils.rag_utils, utils.chat_stream
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+RENDER_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+sys.path.insert(0, {root!r})
+at = AppTest.from_file({app!r}, default_timeout=120).run()
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "error": bool(at.exception), "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def probe(code, cwd):
+    env = dict(os.environ, GROQ_API_KEY=os.environ.get("GROQ_API_KEY", "benchmark-key"))
+    result = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import time and time to first render")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    # An empty working directory: no saved index, like a fresh container
+    cwd = tempfile.mkdtemp()
+    for label, code in (
+        ("app modules import", IMPORT_PROBE.format(root=ROOT, heavy=HEAVY_MODULES)),
+        ("first render", RENDER_PROBE.format(root=ROOT, app=os.path.join(ROOT, "app.py"), heavy=HEAVY_MODULES)),
+    ):
+        results = [probe(code, cwd) for _ in range(args.runs)]
+        seconds = [result["seconds"] for result in results]
+        print(f"{label:>20}: median {statistics.median(seconds) * 1000:.0f} ms, "
+              f"min {min(seconds) * 1000:.0f} ms over {args.runs} runs")
+        print(f"{'':>20}  heavy modules loaded: {', '.join(results[-1]['loaded']) or 'none'}")
+        if results[-1].get("error"):
+            print(f"{'':>20}  (the app raised during the render)")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,5 +10,32 @@ def load_config():
         
 
         "llm_provider": os.getenv("LLM_PROVIDER", "groq"),
-        "model_name": os.getenv("MODEL_NAME","llama-3.1-8b-instant")
+        "model_name": os.getenv("MODEL_NAME","llama-3.1-8b-instant"),
+        "retrieval_backend": os.getenv("RETRIEVAL_BACKEND", "tfidf"),
+        "embedding_model": os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+        "embedding_cache_dir": os.getenv("SENTENCE_TRANSFORMERS_HOME"),
+        "response_cache_path": os.getenv("RESPONSE_CACHE_PATH"),
+        "response_cache_ttl": int(os.getenv("RESPONSE_CACHE_TTL", "86400")),
+        "response_cache_size": int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+        "response_cache_semantic": os.getenv("RESPONSE_CACHE_SEMANTIC", "true").lower() == "true",
+        "serper_api_key": os.getenv("SERPER_API_KEY"),
+        "web_search_ttl": int(os.getenv("WEB_SEARCH_TTL", "300")),
+        "web_search_cache_size": int(os.getenv("WEB_SEARCH_CACHE_SIZE", "256")),
+        "context_budget_tokens": int(os.getenv("CONTEXT_BUDGET_TOKENS", "3000")),
+        "context_summary_tokens": int(os.getenv("CONTEXT_SUMMARY_TOKENS", "300")),
+        "rag_context_chars": int(os.getenv("RAG_CONTEXT_CHARS", "6000")),
+        "retrieval_deadline": float(os.getenv("RETRIEVAL_DEADLINE", "1.0")),
+        "llm_failure_threshold": int(os.getenv("LLM_FAILURE_THRESHOLD", "3")),
+        "llm_cooldown": float(os.getenv("LLM_COOLDOWN", "30")),
+        "llm_hedge": os.getenv("LLM_HEDGE", "false").lower() == "true",
+        "namespace_dir": os.getenv("NAMESPACE_DIR", "data/namespaces"),
+        "namespace_cache_size": int(os.getenv("NAMESPACE_CACHE_SIZE", "16")),
+        "namespace_ttl": float(os.getenv("NAMESPACE_TTL", "86400")),
+        "hybrid_retrieval": os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true",
+        "rrf_k": int(os.getenv("RRF_K", "60")),
+        "groq_api_key": os.getenv("GROQ_API_KEY"),
+        "groq_requests_per_minute": int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30")),
+        "groq_tokens_per_minute": int(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000")),
+        "llm_max_queue_wait": float(os.getenv("LLM_MAX_QUEUE_WAIT", "30")),
+        "llm_batch_max_queue_wait": float(os.getenv("LLM_BATCH_MAX_QUEUE_WAIT", "inf"))
     }
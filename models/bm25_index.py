@@ -0,0 +1,277 @@
+# models/bm25_index.py
+import copy
+import json
+import os
+import re
+
+import numpy as np
+
+from models.embeddings import select_top_k
+from models.index_files import load_array, load_meta, save_index, write_json
+
+# Bump whenever the on-disk layout of BM25Index.save changes
+BM25_FORMAT_VERSION = 1
+
+# Keeps identifiers whole: "BRK.B", "037833100", "VTSAX", "S-Corp"
+_TOKEN = re.compile(r"\w+(?:[.\-]\w+)*")
+_stop_words = None
+
+
+def tokenize(text):
+    global _stop_words
+    if _stop_words is None:
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+        _stop_words = ENGLISH_STOP_WORDS
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _stop_words]
+
+
+def identifier_terms(text):
+    """Query tokens that look like identifiers: they hold a digit or are written in capitals.
+
+    "VTSAX", "BRK.B" and "037833100" qualify; "year" or "Should" do not.
+    """
+    terms = [
+        token for token in _TOKEN.findall(text)
+        if any(c.isdigit() for c in token) or (len(token) > 1 and token.isupper())
+    ]
+    return tokenize(" ".join(terms))
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index kept in flat NumPy arrays.
+
+    Postings are stored term by term like a CSC matrix: term_ptr[t] to
+    term_ptr[t + 1] slices post_docs (ascending chunk ids) and post_tf.
+    The vocabulary is exact, with no max_features cut-off, so a ticker or
+    CUSIP that appears in one chunk is still a term. Adds go to segments
+    that are merged on the next query. Removals only adjust document
+    frequencies, and the caller passes its tombstone mask at query time,
+    as with IncrementalTfidfIndex.
+
+    Queries use max-score pruning. Terms are scored from the highest upper
+    bound down. Once the bounds of the remaining terms cannot lift an unseen
+    chunk past the current k-th best score, the long posting lists of common
+    terms are no longer scanned. The current candidates are binary-searched
+    in them instead.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+        self.n_docs = 0
+        self.n_removed = 0
+        self.total_len = 0
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self.doc_freq = np.zeros(0, dtype=np.int64)
+        self.term_ptr = np.zeros(1, dtype=np.int64)
+        self.post_docs = np.zeros(0, dtype=np.int32)
+        self.post_tf = np.zeros(0, dtype=np.uint16)
+        self._segments = []
+        self._weights = None
+        self._term_max = None
+
+    def copy(self):
+        """Cheap clone for copy-on-write: posting arrays are replaced, never mutated in place"""
+        clone = copy.copy(self)
+        clone.doc_freq = self.doc_freq.copy()
+        clone._segments = list(self._segments)
+        return clone
+
+    @property
+    def n_terms(self):
+        # The vocabulary dict is shared between copies and may already hold
+        # terms a newer copy added; only the first n_terms belong to this one
+        return len(self.doc_freq)
+
+    def add(self, texts):
+        """Append texts as chunk ids n_docs, n_docs + 1, ..."""
+        if not texts:
+            return
+        vocab = self.vocab
+        term_ids, lengths = [], []
+        for text in texts:
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            term_ids.extend([vocab.setdefault(token, len(vocab)) for token in tokens])
+
+        n_new = len(texts)
+        terms = np.asarray(term_ids, dtype=np.int64)
+        docs = np.repeat(np.arange(n_new, dtype=np.int64), lengths)
+        # One key per (term, chunk) pair; unique() counts tf and sorts by term, then chunk
+        keys, tf = np.unique(terms * n_new + docs, return_counts=True)
+        seg_terms = keys // n_new
+        seg_docs = (keys % n_new + self.n_docs).astype(np.int32)
+
+        self.doc_freq = np.concatenate([self.doc_freq, np.zeros(len(vocab) - self.n_terms, dtype=np.int64)])
+        self.doc_freq += np.bincount(seg_terms, minlength=self.n_terms)
+        self.doc_len = np.concatenate([self.doc_len, np.asarray(lengths, dtype=np.int32)])
+        self.total_len += int(sum(lengths))
+        self.n_docs += n_new
+        self._segments.append((seg_terms, seg_docs, np.minimum(tf, 65535).astype(np.uint16)))
+        self._weights = None
+        self._term_max = None
+
+    def _posting_terms(self):
+        return np.repeat(np.arange(len(self.term_ptr) - 1, dtype=np.int64), np.diff(self.term_ptr))
+
+    def _set_postings(self, terms, docs, tfs):
+        # Stable sort keeps chunk ids ascending within each term
+        order = np.argsort(terms, kind='stable')
+        self.post_docs = docs[order]
+        self.post_tf = tfs[order]
+        counts = np.bincount(terms, minlength=self.n_terms)
+        self.term_ptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def _merge(self):
+        if not self._segments:
+            return
+        parts = [(self._posting_terms(), self.post_docs, self.post_tf)] + self._segments
+        self._set_postings(*(np.concatenate(column) for column in zip(*parts)))
+        self._segments = []
+
+    def remove(self, ids):
+        """Tombstone chunks: their terms and length stop counting right away"""
+        if len(ids) == 0:
+            return
+        self._merge()
+        hit = np.flatnonzero(np.isin(self.post_docs, ids))
+        hit_terms = np.searchsorted(self.term_ptr, hit, side='right') - 1
+        self.doc_freq -= np.bincount(hit_terms, minlength=self.n_terms)
+        self.total_len -= int(self.doc_len[ids].sum())
+        self.n_removed += len(ids)
+        self._weights = None
+        self._term_max = None
+
+    def compact(self, keep):
+        """Drop tombstoned chunks and renumber the rest, as the chunk store does"""
+        self._merge()
+        new_ids = np.cumsum(keep) - 1
+        live = keep[self.post_docs]
+        terms = self._posting_terms()[live]
+        self.doc_len = self.doc_len[keep]
+        self.n_docs = len(self.doc_len)
+        self.n_removed = 0
+        self.total_len = int(self.doc_len.sum())
+        self.doc_freq = np.bincount(terms, minlength=self.n_terms).astype(np.int64)
+        self._set_postings(terms, new_ids[self.post_docs[live]].astype(np.int32), self.post_tf[live])
+        self._weights = None
+        self._term_max = None
+
+    def idf(self, terms=None):
+        doc_freq = self.doc_freq if terms is None else self.doc_freq[terms]
+        n_live = self.n_docs - self.n_removed
+        return np.log1p((n_live - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def _bounds(self):
+        """Per-posting tf weights and each term's largest weight (its score upper bound / idf)"""
+        if self._weights is None:
+            self._merge()
+            avg_len = self.total_len / max(self.n_docs - self.n_removed, 1)
+            norm = (self.k1 * (1 - self.b + self.b * self.doc_len / max(avg_len, 1e-9))).astype(np.float32)
+            tf = self.post_tf.astype(np.float32)
+            self._weights = tf * np.float32(self.k1 + 1) / (tf + norm[self.post_docs])
+            self._term_max = np.zeros(self.n_terms, dtype=np.float32)
+            nonempty = np.flatnonzero(np.diff(self.term_ptr) > 0)
+            if len(nonempty):
+                self._term_max[nonempty] = np.maximum.reduceat(self._weights, self.term_ptr[nonempty])
+        return self._weights, self._term_max
+
+    def _query_terms(self, query):
+        ids = {self.vocab.get(token) for token in tokenize(query)}
+        return np.array(sorted(i for i in ids if i is not None and i < self.n_terms), dtype=np.int64)
+
+    def search(self, query, top_k, exclude=None):
+        """Return (ids, scores) of the top_k BM25 matches, best first"""
+        empty = select_top_k(np.zeros(0, dtype=np.int64), np.zeros(0), top_k)
+        terms = self._query_terms(query)
+        if not len(terms) or not top_k or not self.n_docs:
+            return empty
+        weights, term_max = self._bounds()
+        terms = terms[self.doc_freq[terms] > 0]
+        idf = self.idf(terms)
+        bounds = idf * term_max[terms]
+        order = np.argsort(-bounds, kind='stable')
+        terms, idf, bounds = terms[order], idf[order], bounds[order]
+        # remaining[i]: the most terms i, i + 1, ... can still add to any chunk
+        remaining = np.concatenate([np.cumsum(bounds[::-1])[::-1], [0.0]])
+
+        ids = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0)
+        threshold = 0.0
+        for i, term in enumerate(terms):
+            start, end = self.term_ptr[term], self.term_ptr[term + 1]
+            docs = self.post_docs[start:end]
+            contributions = idf[i] * weights[start:end]
+            if len(ids) >= top_k and remaining[i] <= threshold:
+                # No chunk outside the candidates can reach the top k any more
+                positions = np.minimum(np.searchsorted(docs, ids), len(docs) - 1)
+                found = docs[positions] == ids
+                scores[found] += contributions[positions[found]]
+            else:
+                if exclude is not None:
+                    live = ~exclude[docs]
+                    docs, contributions = docs[live], contributions[live]
+                if len(ids):
+                    ids, inverse = np.unique(np.concatenate([ids, docs]), return_inverse=True)
+                    scores = np.bincount(inverse, weights=np.concatenate([scores, contributions]), minlength=len(ids))
+                else:
+                    # The first posting list is already sorted and unique
+                    ids, scores = docs.astype(np.int64), contributions
+            if len(ids) >= top_k:
+                threshold = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+                survivors = scores + remaining[i + 1] >= threshold
+                ids, scores = ids[survivors], scores[survivors]
+        return select_top_k(ids, scores, top_k)
+
+    def search_many(self, queries, top_k, exclude=None):
+        return [self.search(query, top_k, exclude) for query in queries]
+
+    def save(self, directory, checksum):
+        """Write postings, lengths and precomputed bounds as .npy files plus the vocabulary"""
+        weights, term_max = self._bounds()
+        arrays = {
+            "term_ptr": self.term_ptr,
+            "post_docs": self.post_docs,
+            "post_tf": self.post_tf,
+            "doc_len": self.doc_len,
+            "doc_freq": self.doc_freq,
+            "weights": weights,
+            "term_max": term_max,
+        }
+        os.makedirs(directory, exist_ok=True)
+        write_json(os.path.join(directory, "vocab.json"), list(self.vocab)[:self.n_terms])
+        meta = {
+            "version": BM25_FORMAT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "n_docs": self.n_docs,
+            "n_removed": self.n_removed,
+            "total_len": self.total_len,
+            "checksum": checksum,
+        }
+        save_index(directory, arrays, meta)
+
+    @classmethod
+    def load(cls, directory, checksum):
+        """Memory-map a saved index, or return None if it is missing or stale"""
+        meta = load_meta(directory, BM25_FORMAT_VERSION, checksum)
+        if meta is None:
+            return None
+
+        index = cls(k1=meta["k1"], b=meta["b"])
+        with open(os.path.join(directory, "vocab.json"), 'r') as f:
+            index.vocab = {term: i for i, term in enumerate(json.load(f))}
+        for name in ("term_ptr", "post_docs", "post_tf", "doc_len"):
+            setattr(index, name, load_array(directory, name))
+        index._weights = load_array(directory, "weights")
+        index._term_max = load_array(directory, "term_max")
+        # doc_freq changes in place on remove
+        index.doc_freq = load_array(directory, "doc_freq", mmap=False)
+        index.n_docs = meta["n_docs"]
+        index.n_removed = meta["n_removed"]
+        index.total_len = meta["total_len"]
+        if len(index.doc_len) != index.n_docs or len(index.term_ptr) != len(index.doc_freq) + 1:
+            return None
+        return index
@@ -0,0 +1,270 @@
+# models/chunk_store.py
+import hashlib
+import json
+import os
+import re
+from collections.abc import Sequence
+
+import numpy as np
+
+# Bump whenever the on-disk layout below changes
+STORE_FORMAT_VERSION = 1
+
+# Fixed-width metadata per chunk; -1 stands for "no doc_id/page", b"" for no hash
+RECORD_DTYPE = np.dtype([("doc", "<i4"), ("page", "<i4"), ("start", "<i8"), ("end", "<i8"), ("hash", "S16")])
+
+_DATA_FILE = re.compile(r"^(text|offsets|records)\.\d+\.bin$|^deleted\.\d+\.\d+\.npy$")
+
+
+def _map(path, dtype, count):
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+def _write_at(path, offset, payload):
+    """Truncate path to offset, append payload and flush it to disk"""
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class ChunkStore:
+    """Append-only chunk texts and metadata, memory-mapped for reading.
+
+    Each generation keeps three append-only files: text.<g>.bin (UTF-8
+    chunk texts back to back), offsets.<g>.bin (int64 end offset of each
+    chunk) and records.<g>.bin (one RECORD_DTYPE row per chunk).
+    manifest.json is the commit point. It is replaced atomically and
+    records how many chunks are committed, so bytes past that count are
+    an unfinished append that the next append overwrites. Tombstones live
+    in a deleted.<g>.<commit>.npy named by the manifest. Compaction writes
+    generation g+1 and commits it the same way.
+
+    Rows are never rewritten in place. A reader holding n rows can keep
+    using them while a writer appends, and other processes share the
+    mapped pages.
+    """
+
+    def __init__(self, directory, generation=0):
+        self.directory = directory
+        self.generation = generation
+        self.commit_id = 0
+        self.n_chunks = 0
+        self.doc_ids = []
+        self.doc_codes = {}
+        self.deleted = np.zeros(0, dtype=bool)
+        self.doc_hashes = {}
+        self.checksum = None
+        self.committed = False
+        self._remap()
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.{self.generation}.bin")
+
+    def _remap(self):
+        self.offsets = _map(self._path("offsets"), np.int64, self.n_chunks)
+        self.meta = _map(self._path("records"), RECORD_DTYPE, self.n_chunks)
+        text_bytes = int(self.offsets[-1]) if self.n_chunks else 0
+        self.text = _map(self._path("text"), np.uint8, text_bytes)
+
+    @classmethod
+    def open(cls, directory):
+        """Map the committed chunks in directory (an empty store if there is no manifest)"""
+        manifest_path = os.path.join(directory, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return cls(directory)
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get("version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"unsupported chunk store version {manifest.get('version')}")
+        store = cls.__new__(cls)
+        store.directory = directory
+        store.generation = manifest["generation"]
+        store.commit_id = manifest["commit"]
+        store.n_chunks = manifest["n_chunks"]
+        store.doc_ids = manifest["doc_ids"]
+        store.doc_codes = {doc_id: code for code, doc_id in enumerate(store.doc_ids)}
+        store.doc_hashes = manifest["doc_hashes"]
+        store.checksum = manifest["checksum"]
+        store.committed = True
+        store.deleted = np.zeros(store.n_chunks, dtype=bool)
+        if manifest.get("deleted_file"):
+            store.deleted = np.load(os.path.join(directory, manifest["deleted_file"]))
+        store._remap()
+        return store
+
+    def is_latest(self):
+        """False once a newer commit exists on disk, e.g. from another instance of this store"""
+        try:
+            with open(os.path.join(self.directory, "manifest.json"), 'r') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return not self.committed
+        return (manifest["generation"], manifest["commit"]) == (self.generation, self.commit_id)
+
+    def _doc_code(self, doc_id):
+        if doc_id is None:
+            return -1
+        code = self.doc_codes.get(doc_id)
+        if code is None:
+            code = self.doc_codes[doc_id] = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+        return code
+
+    def text_at(self, row):
+        start = int(self.offsets[row - 1]) if row else 0
+        return self.text[start:int(self.offsets[row])].tobytes().decode("utf-8")
+
+    def record_at(self, row, record_type):
+        meta = self.meta[row]
+        return record_type(
+            self.doc_ids[meta["doc"]] if meta["doc"] >= 0 else None,
+            int(meta["page"]) if meta["page"] >= 0 else None,
+            int(meta["start"]),
+            int(meta["end"]),
+            meta["hash"].decode("ascii") or None,
+            self.text_at(row),
+        )
+
+    def hashes(self, n_rows):
+        return [value.decode("ascii") for value in self.meta["hash"][:n_rows]]
+
+    def rows_for_doc(self, doc_id, n_rows):
+        code = self.doc_codes.get(doc_id)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.meta["doc"][:n_rows] == code)
+
+    def append(self, records, n_rows):
+        """Write records after the first n_rows chunks; only the new bytes hit the disk"""
+        if not records:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        text_start = int(self.offsets[n_rows - 1]) if n_rows else 0
+        encoded = [record.text.encode("utf-8") for record in records]
+        ends = text_start + np.cumsum([len(data) for data in encoded], dtype=np.int64)
+        meta = np.zeros(len(records), dtype=RECORD_DTYPE)
+        meta["doc"] = [self._doc_code(record.doc_id) for record in records]
+        meta["page"] = [-1 if record.page is None else record.page for record in records]
+        meta["start"] = [record.start or 0 for record in records]
+        meta["end"] = [record.end or 0 for record in records]
+        meta["hash"] = [(record.hash or "").encode("ascii") for record in records]
+
+        # Truncation only cuts bytes past the committed rows, which no reader maps
+        _write_at(self._path("text"), text_start, b"".join(encoded))
+        _write_at(self._path("offsets"), n_rows * 8, ends.astype("<i8").tobytes())
+        _write_at(self._path("records"), n_rows * RECORD_DTYPE.itemsize, meta.tobytes())
+        self.n_chunks = n_rows + len(records)
+        self._remap()
+
+    def compacted(self, keep, n_rows):
+        """A new generation holding only the kept rows; committed by the next commit()"""
+        rows = np.flatnonzero(keep[:n_rows])
+        new = ChunkStore.__new__(ChunkStore)
+        new.directory = self.directory
+        new.generation = self.generation + 1
+        new.commit_id = self.commit_id
+        new.doc_ids = list(self.doc_ids)
+        new.doc_codes = dict(self.doc_codes)
+        new.deleted = self.deleted
+        new.doc_hashes = self.doc_hashes
+        new.checksum = self.checksum
+        new.committed = self.committed
+        new.n_chunks = 0
+        new.offsets = new.meta = new.text = None
+
+        starts = np.concatenate([[0], self.offsets[:n_rows - 1]])[rows] if n_rows else np.zeros(0, dtype=np.int64)
+        ends = np.asarray(self.offsets[rows], dtype=np.int64)
+        lengths = ends - starts
+        # Gather every kept byte with one fancy index instead of a per-row loop
+        positions = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths) + np.arange(lengths.sum())
+        text = np.asarray(self.text[positions], dtype=np.uint8)
+
+        os.makedirs(self.directory, exist_ok=True)
+        _write_at(new._path("text"), 0, text.tobytes())
+        _write_at(new._path("offsets"), 0, np.cumsum(lengths, dtype=np.int64).astype("<i8").tobytes())
+        _write_at(new._path("records"), 0, np.asarray(self.meta[rows]).tobytes())
+        new.n_chunks = len(rows)
+        new._remap()
+        return new
+
+    def commit(self, n_rows, deleted, doc_hashes):
+        """Atomically publish the first n_rows chunks, tombstones and file hashes"""
+        os.makedirs(self.directory, exist_ok=True)
+        deleted = np.asarray(deleted[:n_rows], dtype=bool)
+        text_bytes = int(self.offsets[n_rows - 1]) if n_rows else 0
+        self.checksum = hashlib.sha256(json.dumps(
+            [self.generation, n_rows, text_bytes, hashlib.sha1(np.packbits(deleted).tobytes()).hexdigest()]
+        ).encode("utf-8")).hexdigest()
+
+        self.commit_id += 1
+        deleted_file = None
+        if deleted.any():
+            deleted_file = f"deleted.{self.generation}.{self.commit_id}.npy"
+            tmp_path = os.path.join(self.directory, "deleted.tmp.npy")
+            np.save(tmp_path, deleted)
+            os.replace(tmp_path, os.path.join(self.directory, deleted_file))
+
+        manifest = {
+            "version": STORE_FORMAT_VERSION,
+            "generation": self.generation,
+            "commit": self.commit_id,
+            "n_chunks": n_rows,
+            "text_bytes": text_bytes,
+            "doc_ids": self.doc_ids,
+            "doc_hashes": doc_hashes,
+            "deleted_file": deleted_file,
+            "checksum": self.checksum,
+        }
+        tmp_path = os.path.join(self.directory, "manifest.tmp.json")
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.directory, "manifest.json"))
+        self.deleted = deleted
+        self.doc_hashes = dict(doc_hashes)
+        self.committed = True
+        self._remove_unreferenced(deleted_file)
+        return self.checksum
+
+    def _remove_unreferenced(self, deleted_file):
+        # Older generations and tombstone files; readers that still map them
+        # keep their pages until they let go (POSIX unlink semantics)
+        current = {f"{name}.{self.generation}.bin" for name in ("text", "offsets", "records")}
+        current.add(deleted_file)
+        for name in os.listdir(self.directory):
+            if _DATA_FILE.match(name) and name not in current:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+class ChunkView(Sequence):
+    """Read-only list-like view of the first n rows of a ChunkStore.
+
+    get(store, row) turns one row into a value (its text, or a ChunkRecord).
+    """
+
+    def __init__(self, store, n_rows, get):
+        self.store = store
+        self.n_rows = n_rows
+        self.get = get
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(self.n_rows))]
+        row = int(row)
+        if row < 0:
+            row += self.n_rows
+        if not 0 <= row < self.n_rows:
+            raise IndexError("chunk row out of range")
+        return self.get(self.store, row)
@@ -0,0 +1,202 @@
+# models/dense_index.py
+import copy
+import os
+import re
+import zlib
+
+import numpy as np
+
+from models.embeddings import select_top_k
+from models.index_files import load_array, load_meta, save_index
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# Bump whenever the on-disk layout of DenseIndex.save changes
+DENSE_FORMAT_VERSION = 1
+
+
+class StubEncoder:
+    """Deterministic bag-of-words encoder for tests; never downloads a model"""
+
+    def __init__(self, dim=64):
+        self.dim = dim
+        self.name = f"stub-{dim}"
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                vectors[row, zlib.crc32(token.encode("utf-8")) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEncoder:
+    """Batch sentence embeddings from a locally cached sentence-transformers model"""
+
+    def __init__(self, model_name, cache_folder=None, batch_size=64):
+        from sentence_transformers import SentenceTransformer
+
+        # local_files_only keeps startup offline; the model must already be cached
+        self.model = SentenceTransformer(model_name, cache_folder=cache_folder, local_files_only=True)
+        self.name = model_name
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+
+    def encode(self, texts):
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def load_encoder(model_name, cache_folder=None):
+    if model_name == "stub":
+        return StubEncoder()
+    return SentenceTransformerEncoder(model_name, cache_folder=cache_folder)
+
+
+class DenseIndex:
+    """Inner-product index over L2-normalised sentence embeddings.
+
+    Small corpora use an exact ``IndexFlatIP``; once the corpus reaches
+    ``ann_threshold`` vectors the index is rebuilt once as HNSW, which keeps
+    query latency sub-linear and, unlike IVF, needs no training as chunks
+    keep arriving. Without faiss installed it falls back to a NumPy scan.
+    """
+
+    def __init__(self, encoder, ann_threshold=20000, hnsw_m=32, ef_search=64):
+        self.encoder = encoder
+        self.dim = encoder.dim
+        self.ann_threshold = ann_threshold
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.n_docs = 0
+        self._blocks = []
+        self._index = None
+
+    def add(self, texts):
+        """Encode texts in one batch and append them to the index"""
+        if not texts:
+            return
+        vectors = np.ascontiguousarray(self.encoder.encode(texts), dtype=np.float32)
+        self._blocks.append(vectors)
+        self.n_docs += len(vectors)
+        if faiss is None:
+            return
+        if self._index is None or (self._is_flat() and self.n_docs >= self.ann_threshold):
+            self._index = self._build_index(self.vectors)
+        else:
+            self._index.add(vectors)
+
+    def copy(self):
+        """Clone for copy-on-write; stored vectors are shared, the faiss index is not"""
+        clone = copy.copy(self)
+        clone._blocks = list(self._blocks)
+        if self._index is not None:
+            clone._index = faiss.clone_index(self._index)
+        return clone
+
+    def remove(self, ids):
+        """Tombstones are applied at query time through the exclude mask"""
+
+    def compact(self, keep):
+        """Drop tombstoned rows and rebuild from the stored vectors; nothing is re-encoded"""
+        vectors = np.ascontiguousarray(self.vectors[np.flatnonzero(keep)])
+        self._blocks = [vectors]
+        self.n_docs = len(vectors)
+        self._index = self._build_index(vectors) if faiss is not None and self.n_docs else None
+
+    @property
+    def vectors(self):
+        if len(self._blocks) != 1:
+            merged = np.vstack(self._blocks) if self._blocks else np.zeros((0, self.dim), dtype=np.float32)
+            self._blocks = [merged]
+        return self._blocks[0]
+
+    def _is_flat(self):
+        return isinstance(self._index, faiss.IndexFlat)
+
+    def _build_index(self, vectors):
+        if len(vectors) >= self.ann_threshold:
+            index = faiss.IndexHNSWFlat(self.dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efSearch = self.ef_search
+        else:
+            index = faiss.IndexFlatIP(self.dim)
+        index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        return index
+
+    def search(self, query, top_k, threshold=None, exclude=None):
+        """Return (ids, scores) of the top_k nearest chunks, best first"""
+        return self.search_many([query], top_k, threshold, exclude)[0]
+
+    def search_many(self, queries, top_k, threshold=None, exclude=None):
+        """Encode all queries in one batch and search them together"""
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+        if min(top_k, self.n_docs) <= 0:
+            return [empty for _ in queries]
+        query_vectors = np.ascontiguousarray(self.encoder.encode(queries), dtype=np.float32)
+        if self._index is None:
+            similarities = query_vectors @ self.vectors.T
+            all_ids = np.arange(self.n_docs)
+            return [select_top_k(all_ids, row, top_k, threshold, exclude) for row in similarities]
+
+        # Over-fetch past tombstones, doubling k until every query has top_k live hits
+        fetch = min(top_k * 2 if exclude is not None else top_k, self.n_docs)
+        while True:
+            scores, ids = self._index.search(query_vectors, fetch)
+            results = []
+            for row_ids, row_scores in zip(ids, scores):
+                keep = row_ids >= 0
+                if exclude is not None:
+                    keep[keep] = ~exclude[row_ids[keep]]
+                results.append((row_ids[keep], row_scores[keep]))
+            if fetch >= self.n_docs or all(len(row_ids) >= top_k for row_ids, _ in results):
+                break
+            fetch = min(fetch * 2, self.n_docs)
+        if threshold is not None:
+            results = [(row_ids[row_scores > threshold], row_scores[row_scores > threshold]) for row_ids, row_scores in results]
+        return [(row_ids[:top_k], row_scores[:top_k]) for row_ids, row_scores in results]
+
+    def save(self, directory, checksum):
+        os.makedirs(directory, exist_ok=True)
+        if self._index is not None:
+            tmp_path = os.path.join(directory, "faiss.tmp.index")
+            faiss.write_index(self._index, tmp_path)
+            os.replace(tmp_path, os.path.join(directory, "faiss.index"))
+        meta = {
+            "version": DENSE_FORMAT_VERSION,
+            "encoder": self.encoder.name,
+            "dim": self.dim,
+            "n_docs": self.n_docs,
+            "checksum": checksum,
+        }
+        save_index(directory, {"vectors": self.vectors}, meta)
+
+    @classmethod
+    def load(cls, directory, checksum, encoder, **kwargs):
+        """Load a saved index, or return None if it is missing or stale"""
+        meta = load_meta(directory, DENSE_FORMAT_VERSION, checksum)
+        if meta is None or meta.get("encoder") != encoder.name:
+            return None
+
+        index = cls(encoder, **kwargs)
+        vectors = load_array(directory, "vectors")
+        if vectors.shape != (meta["n_docs"], meta["dim"]):
+            return None
+        index._blocks = [vectors]
+        index.n_docs = meta["n_docs"]
+        faiss_path = os.path.join(directory, "faiss.index")
+        if faiss is not None:
+            if os.path.exists(faiss_path):
+                index._index = faiss.read_index(faiss_path)
+            else:
+                index._index = index._build_index(vectors)
+        return index
@@ -89,61 +89,535 @@ class EmbeddingModel:
 
         '''
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+# scikit-learn and SciPy are imported where they are first needed: together
+# they take over a second to import, and a cold start may never use them.
+from collections import namedtuple
+import copy
 import numpy as np
+import hashlib
 import json
 import os
 import re
 from config.config import load_config
+from models.chunk_store import ChunkStore, ChunkView
+from models.index_files import load_array, load_meta, save_index
+
+# Bump whenever the on-disk layout of IncrementalTfidfIndex.save changes
+INDEX_FORMAT_VERSION = 1
+
+# One indexed chunk: source document, page, char span within the page and a
+# content hash. Persisted by ChunkStore as a fixed-width row plus the text.
+ChunkRecord = namedtuple("ChunkRecord", ["doc_id", "page", "start", "end", "hash", "text"])
+
+def make_chunk_record(text, doc_id=None, page=None, start=0):
+    content_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+    return ChunkRecord(doc_id, page, start, start + len(text), content_hash, text)
+
+def namespace_dirname(namespace):
+    """Directory name for a namespace's partition: a digest, never the raw key"""
+    return hashlib.sha256(str(namespace).encode("utf-8")).hexdigest()[:32]
+
+def make_hashing_vectorizer(n_features=2 ** 18):
+    """Stateless term counter shared by the TF-IDF index and the response cache"""
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    return HashingVectorizer(
+        stop_words='english',
+        n_features=n_features,
+        alternate_sign=False,
+        norm=None,
+    )
+
+def select_top_k(ids, scores, top_k, threshold=None, exclude=None):
+    """Best top_k (ids, scores) above threshold, sorted by descending score.
+
+    The threshold and exclude (boolean tombstone mask indexed by id) masks
+    run first and argpartition then picks the top_k in O(n), so only the
+    survivors are ever sorted.
+    """
+    if exclude is not None:
+        keep = ~exclude[ids]
+        ids, scores = ids[keep], scores[keep]
+    if threshold is not None:
+        mask = scores > threshold
+        ids, scores = ids[mask], scores[mask]
+    if top_k <= 0:
+        return ids[:0], scores[:0]
+    if len(scores) > top_k:
+        part = np.argpartition(-scores, top_k - 1)[:top_k]
+        ids, scores = ids[part], scores[part]
+    order = np.argsort(-scores, kind='stable')
+    return ids[order], scores[order]
+
+def reciprocal_rank_fusion(rankings, top_k, k=60):
+    """Merge ranked id lists by summing 1 / (k + rank); ids ranked well by any list rise"""
+    fused = {}
+    for ranking in rankings:
+        for rank, idx in enumerate(ranking):
+            fused[int(idx)] = fused.get(int(idx), 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=lambda idx: -fused[idx])[:top_k]
+
+class IncrementalTfidfIndex:
+    """TF-IDF index that can grow one batch of chunks at a time.
+
+    Term counts come from a stateless HashingVectorizer, so new chunks never
+    force a refit. Document frequencies are kept as a running count and new
+    rows are appended as segments; the segments are merged and re-weighted
+    lazily on the first query after an add, so adding N chunks costs O(N).
+
+    Scores match a full ``TfidfVectorizer(stop_words='english')`` refit
+    (smooth idf, l2 norm) exactly except where two terms collide in the
+    2**18 hash space, which shifts cosine scores by well under 1e-3 on
+    typical filings.
+    """
+
+    def __init__(self, n_features=2 ** 18):
+        self.n_features = n_features
+        self._vectorizer = None
+        self.doc_freq = np.zeros(n_features, dtype=np.int64)
+        self.n_docs = 0
+        self.n_removed = 0
+        self._segments = []
+        self._counts = None
+        self._matrix = None
+        self._idf = None
+
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            self._vectorizer = make_hashing_vectorizer(self.n_features)
+        return self._vectorizer
+
+    def add(self, texts):
+        """Append texts to the index without touching existing rows"""
+        if not texts:
+            return
+        counts = self.vectorizer.transform(texts).tocsr()
+        counts.sum_duplicates()
+        self.doc_freq += np.bincount(counts.indices, minlength=self.n_features)
+        self.n_docs += counts.shape[0]
+        self._segments.append(counts)
+        self._matrix = None
+        self._idf = None
+
+    def copy(self):
+        """Cheap clone for copy-on-write: row data is shared, never mutated in place"""
+        clone = copy.copy(self)
+        clone.doc_freq = self.doc_freq.copy()
+        clone._segments = list(self._segments)
+        return clone
+
+    def remove(self, ids):
+        """Tombstone rows: their terms stop counting towards idf right away"""
+        if len(ids) == 0:
+            return
+        removed = self._merged_counts()[ids]
+        self.doc_freq -= np.bincount(removed.indices, minlength=self.n_features)
+        self.n_removed += len(ids)
+        self._matrix = None
+        self._idf = None
+
+    def compact(self, keep):
+        """Drop tombstoned rows by slicing the stored counts; nothing is re-tokenized"""
+        self._counts = self._merged_counts()[np.flatnonzero(keep)]
+        self.doc_freq = np.bincount(self._counts.indices, minlength=self.n_features).astype(np.int64)
+        self.n_docs = self._counts.shape[0]
+        self.n_removed = 0
+        self._matrix = None
+        self._idf = None
+
+    def idf(self):
+        if self._idf is None:
+            n_live = self.n_docs - self.n_removed
+            self._idf = np.log((1 + n_live) / (1 + self.doc_freq)) + 1.0
+        return self._idf
+
+    def _merged_counts(self):
+        if self._segments:
+            import scipy.sparse as sp
+
+            parts = [self._counts] if self._counts is not None else []
+            self._counts = sp.vstack(parts + self._segments, format='csr')
+            self._segments = []
+        return self._counts
+
+    @property
+    def matrix(self):
+        """L2-normalised TF-IDF matrix, merged from pending segments on demand"""
+        if self._matrix is None and self.n_docs:
+            self._matrix = self._weight(self._merged_counts())
+        return self._matrix
+
+    def search(self, query, top_k, threshold=None, exclude=None):
+        """Return (ids, scores) of the top_k closest chunks, best first"""
+        return self.search_many([query], top_k, threshold, exclude)[0]
+
+    def search_many(self, queries, top_k, threshold=None, exclude=None):
+        """Score every query against the corpus in a single sparse matmul.
+
+        Rows are already L2-normalised, so the product is the cosine score.
+        The result stays sparse: only chunks sharing a term with the query
+        are candidates, and zero scores are never returned.
+        """
+        if not self.n_docs:
+            return [select_top_k(np.zeros(0, dtype=np.int64), np.zeros(0), top_k) for _ in queries]
+        # (n_docs x n_queries) keeps the big matrix on the CSR side of the product
+        scores = (self.matrix @ self.transform(queries).T).T.tocsr()
+        results = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            results.append(select_top_k(scores.indices[start:end], scores.data[start:end], top_k, threshold, exclude))
+        return results
+
+    def transform(self, texts):
+        counts = self.vectorizer.transform(texts).tocsr()
+        counts.sum_duplicates()
+        # Terms no live chunk contains are dropped, as a fitted vocabulary would
+        counts.data[self.doc_freq[counts.indices] == 0] = 0
+        counts.eliminate_zeros()
+        return self._weight(counts)
+
+    def _weight(self, counts):
+        import scipy.sparse as sp
+        from sklearn.preprocessing import normalize
+
+        # Same sparsity pattern as counts, so indices/indptr can be shared on disk
+        weighted = sp.csr_matrix(
+            (counts.data * self.idf()[counts.indices], counts.indices, counts.indptr),
+            shape=counts.shape,
+        )
+        return normalize(weighted, norm='l2', copy=False)
+
+    def save(self, directory, checksum):
+        """Write counts, weights, idf and doc frequencies as .npy files"""
+        matrix = self.matrix
+        arrays = {
+            "indptr": self._counts.indptr,
+            "indices": self._counts.indices,
+            "counts": self._counts.data,
+            "data": matrix.data,
+            "idf": self.idf(),
+            "doc_freq": self.doc_freq,
+        }
+        meta = {
+            "version": INDEX_FORMAT_VERSION,
+            "n_features": self.n_features,
+            "n_docs": self.n_docs,
+            "n_removed": self.n_removed,
+            "checksum": checksum,
+        }
+        save_index(directory, arrays, meta)
+
+    @classmethod
+    def load(cls, directory, checksum):
+        """Memory-map a saved index, or return None if it is missing or stale"""
+        import scipy.sparse as sp
+
+        meta = load_meta(directory, INDEX_FORMAT_VERSION, checksum)
+        if meta is None:
+            return None
+
+        index = cls(n_features=meta["n_features"])
+        arrays = {name: load_array(directory, name) for name in ("indptr", "indices", "counts", "data", "idf")}
+        shape = (meta["n_docs"], meta["n_features"])
+        if len(arrays["indptr"]) != shape[0] + 1:
+            return None
+        index.n_docs = meta["n_docs"]
+        index.n_removed = meta.get("n_removed", 0)
+        # doc_freq is updated in place on add, so it is the one array not mapped
+        index.doc_freq = load_array(directory, "doc_freq", mmap=False)
+        index._idf = arrays["idf"]
+        index._counts = sp.csr_matrix((arrays["counts"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
+        index._matrix = sp.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
+        return index
 
 class EmbeddingModel:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
-        self.embeddings_path = "data/embeddings.json"
-        self.documents = []
-        self.tfidf_matrix = None
-        self.is_fitted = False
+    # Compact once more than this share of stored rows are tombstones
+    compaction_ratio = 0.25
+    # Hybrid search fuses this many times top_k candidates from each index
+    fusion_depth = 4
+    
+    def __init__(self, backend=None, encoder=None, namespace=None):
+        config = load_config()
+        self.backend = backend or config.get("retrieval_backend", "tfidf")
+        self.encoder = encoder
+        self.namespace = namespace
+        # A namespace (one user or session) gets its own store and index under
+        # a hashed directory name, so nothing about the key leaks onto disk
+        data_dir = "data"
+        if namespace is not None:
+            data_dir = os.path.join(config.get("namespace_dir", "data/namespaces"), namespace_dirname(namespace))
+        
+        if self.backend == "faiss":
+            if self.encoder is None:
+                from models.dense_index import load_encoder
+                self.encoder = load_encoder(
+                    config.get("embedding_model", "sentence-transformers/all-MiniLM-L6-v2"),
+                    cache_folder=config.get("embedding_cache_dir"),
+                )
+            self.index_dir = os.path.join(data_dir, "faiss_index")
+        else:
+            self.backend = "tfidf"
+            self.index_dir = os.path.join(data_dir, "tfidf_index")
+        
+        self.index = self._new_index()
+        # BM25 alongside the vector index catches exact tickers, CUSIPs and fund codes
+        self.hybrid = config.get("hybrid_retrieval", True)
+        self.rrf_k = config.get("rrf_k", 60)
+        self.lexical_dir = os.path.join(data_dir, "bm25_index")
+        self.lexical = self._new_lexical()
+        self.store_dir = os.path.join(data_dir, "chunk_store")
+        # Pre-chunk-store format; imported once into the shared store if found
+        self.embeddings_path = "data/embeddings.json" if namespace is None else None
+        self.store = ChunkStore(self.store_dir)
+        self._reset()
         self.load_embeddings()
     
+    def _reset(self):
+        self.n_rows = 0
+        self.deleted = np.zeros(0, dtype=bool)
+        self.hash_index = {}
+        self.doc_hashes = {}
+        self.is_fitted = False
+        # The exception that made the last add/remove/replace/save fail, or None
+        self.last_error = None
+    
+    def copy(self):
+        """Clone for copy-on-write updates; the index and chunk store share their row data"""
+        clone = copy.copy(self)
+        clone.deleted = self.deleted.copy()
+        clone.hash_index = dict(self.hash_index)
+        clone.doc_hashes = dict(self.doc_hashes)
+        clone.index = self.index.copy()
+        if self.lexical is not None:
+            clone.lexical = self.lexical.copy()
+        return clone
+    
+    @property
+    def documents(self):
+        """Chunk texts, read from the memory-mapped store on access"""
+        return ChunkView(self.store, self.n_rows, ChunkStore.text_at)
+    
+    @property
+    def records(self):
+        return ChunkView(self.store, self.n_rows, lambda store, row: store.record_at(row, ChunkRecord))
+    
+    @property
+    def n_live(self):
+        return self.n_rows - int(self.deleted.sum())
+    
+    @property
+    def tfidf_matrix(self):
+        if self.backend != "tfidf" or not self.is_fitted:
+            return None
+        return self.index.matrix
+    
+    def _new_index(self):
+        if self.backend == "faiss":
+            from models.dense_index import DenseIndex
+            return DenseIndex(self.encoder)
+        return IncrementalTfidfIndex()
+    
+    def _new_lexical(self):
+        if not self.hybrid:
+            return None
+        from models.bm25_index import BM25Index
+        return BM25Index()
+    
+    def _load_index(self, checksum):
+        if self.backend == "faiss":
+            from models.dense_index import DenseIndex
+            return DenseIndex.load(self.index_dir, checksum, self.encoder)
+        return IncrementalTfidfIndex.load(self.index_dir, checksum)
+    
+    def _exclude(self):
+        return self.deleted if self.deleted.any() else None
+    
+    def _restored(self, fresh, saved, directory):
+        if saved is not None and saved.n_docs == self.n_rows:
+            return saved
+        # Missing, stale or from an older format: refit once and persist
+        fresh.add(list(self.documents))
+        fresh.remove(np.flatnonzero(self.deleted))
+        fresh.save(directory, self.store.checksum)
+        return fresh
+    
     def load_embeddings(self):
+        self.index = self._new_index()
+        self.lexical = self._new_lexical()
+        self._reset()
         try:
-            if os.path.exists(self.embeddings_path):
-                with open(self.embeddings_path, 'r') as f:
-                    data = json.load(f)
-                    self.documents = data.get("texts", [])
-                    
-                    if self.documents:
-                        self.tfidf_matrix = self.vectorizer.fit_transform(self.documents)
-                        self.is_fitted = True
-            else:
-                self.documents, self.tfidf_matrix, self.is_fitted = [], None, False
+            self.store = ChunkStore.open(self.store_dir)
+            if not self.store.committed and self.embeddings_path and os.path.exists(self.embeddings_path):
+                self._import_json()
+            self.n_rows = self.store.n_chunks
+            self.deleted = self.store.deleted.copy()
+            self.doc_hashes = dict(self.store.doc_hashes)
+            self.hash_index = self._index_hashes()
+            
+            if self.n_rows:
+                self.index = self._restored(self.index, self._load_index(self.store.checksum), self.index_dir)
+                if self.lexical is not None:
+                    from models.bm25_index import BM25Index
+                    saved = BM25Index.load(self.lexical_dir, self.store.checksum)
+                    self.lexical = self._restored(self.lexical, saved, self.lexical_dir)
+                self.is_fitted = True
         except Exception as e:
             print(f"❌ Error loading embeddings: {e}")
-            self.documents, self.tfidf_matrix, self.is_fitted = [], None, False
+            self.index = self._new_index()
+            self.lexical = self._new_lexical()
+            self.store = ChunkStore(self.store_dir)
+            self._reset()
+    
+    def _import_json(self):
+        """Move chunks from the old all-in-one embeddings.json into the chunk store"""
+        with open(self.embeddings_path, 'r') as f:
+            data = json.load(f)
+        texts = data.get("texts", [])
+        metadata = data.get("records") or [[None, None, 0, 0, None]] * len(texts)
+        self.store.append([ChunkRecord(*meta, text) for meta, text in zip(metadata, texts)], 0)
+        deleted = np.zeros(len(texts), dtype=bool)
+        deleted[data.get("deleted", [])] = True
+        self.store.commit(len(texts), deleted, data.get("doc_hashes", {}))
     
     def save_embeddings(self):
+        """Publish appended chunks and tombstones; only the manifest and index are rewritten"""
         try:
-            os.makedirs(os.path.dirname(self.embeddings_path), exist_ok=True)
-            data = {"texts": self.documents}
-            with open(self.embeddings_path, 'w') as f:
-                json.dump(data, f)
+            checksum = self.store.commit(self.n_rows, self.deleted, self.doc_hashes)
+            if self.n_rows:
+                self.index.save(self.index_dir, checksum)
+                if self.lexical is not None:
+                    self.lexical.save(self.lexical_dir, checksum)
         except Exception as e:
             print(f"❌ Error saving embeddings: {e}")
+            self.last_error = e
+    
+    def _index_hashes(self):
+        """(doc_id, content hash) -> row for every live chunk in the store"""
+        codes = self.store.meta["doc"][:self.n_rows]
+        return {
+            (self.store.doc_ids[code] if code >= 0 else None, content_hash): row
+            for row, (code, content_hash) in enumerate(zip(codes, self.store.hashes(self.n_rows)))
+            if content_hash and not self.deleted[row]
+        }
+    
+    def _add_records(self, chunks, doc_id=None):
+        """Clean, dedupe by content hash within each document and index chunks; does not save.
+        
+        Two documents that share a chunk each keep their own row, so removing
+        one of them never takes the chunk away from the other.
+        """
+        new_chunks, new_records, new_keys = [], [], {}
+        for chunk in chunks:
+            record = chunk if isinstance(chunk, ChunkRecord) else make_chunk_record(chunk)
+            if doc_id is not None:
+                record = record._replace(doc_id=doc_id)
+            key = (record.doc_id, record.hash)
+            if key in self.hash_index or key in new_keys:
+                continue
+            cleaned_chunk = self.clean_text(record.text)
+            if cleaned_chunk and len(cleaned_chunk.split()) > 3:
+                new_keys[key] = self.n_rows + len(new_chunks)
+                new_chunks.append(cleaned_chunk)
+                new_records.append(record._replace(text=cleaned_chunk))
+        
+        if new_chunks:
+            self.store.append(new_records, self.n_rows)
+            # Only once the rows are written, so a failed append can be retried
+            self.hash_index.update(new_keys)
+            self.n_rows += len(new_chunks)
+            self.deleted = np.concatenate([self.deleted, np.zeros(len(new_chunks), dtype=bool)])
+            self.index.add(new_chunks)
+            if self.lexical is not None:
+                self.lexical.add(new_chunks)
+            self.is_fitted = True
+        return len(new_chunks)
+    
+    def _remove_rows(self, doc_id):
+        """Tombstone every live chunk of doc_id; does not save"""
+        rows = self.store.rows_for_doc(doc_id, self.n_rows)
+        rows = rows[~self.deleted[rows]]
+        if len(rows):
+            self.deleted[rows] = True
+            self.index.remove(rows)
+            if self.lexical is not None:
+                self.lexical.remove(rows)
+            hashes = self.store.meta["hash"][rows]
+            for content_hash in hashes:
+                self.hash_index.pop((doc_id, content_hash.decode("ascii")), None)
+        self.doc_hashes.pop(doc_id, None)
+        return len(rows)
+    
+    def _maybe_compact(self):
+        n_deleted = int(self.deleted.sum())
+        if n_deleted == 0 or n_deleted <= self.compaction_ratio * self.n_rows:
+            return
+        keep = ~self.deleted
+        # A new store generation: readers of the old one keep their rows
+        self.store = self.store.compacted(keep, self.n_rows)
+        self.n_rows = self.store.n_chunks
+        self.index.compact(keep)
+        if self.lexical is not None:
+            self.lexical.compact(keep)
+        self.deleted = np.zeros(self.n_rows, dtype=bool)
+        self.hash_index = self._index_hashes()
+        self.is_fitted = bool(self.n_rows)
     
     def add_document(self, text, chunks):
+        """Index chunks given as plain strings or ChunkRecords, skipping duplicates"""
+        self.last_error = None
         try:
-            for chunk in chunks:
-                cleaned_chunk = self.clean_text(chunk)
-                if cleaned_chunk and len(cleaned_chunk.split()) > 3:
-                    self.documents.append(cleaned_chunk)
-            
-            if self.documents:
-                self.tfidf_matrix = self.vectorizer.fit_transform(self.documents)
-                self.is_fitted = True
+            if self._add_records(chunks):
                 self.save_embeddings()
         except Exception as e:
             print(f"❌ Error adding document: {e}")
+            self.last_error = e
+    
+    def has_file(self, doc_id, file_hash):
+        """True if this exact file content is already indexed under doc_id.
+        
+        The same content under another name is indexed again, so removing
+        one copy leaves the other searchable.
+        """
+        return self.doc_hashes.get(doc_id) == file_hash
+    
+    def remove_document(self, doc_id):
+        """Tombstone all chunks of doc_id; compacts when tombstones pile up"""
+        self.last_error = None
+        try:
+            removed = self._remove_rows(doc_id)
+            self._maybe_compact()
+            self.save_embeddings()
+            return removed
+        except Exception as e:
+            print(f"❌ Error removing document: {e}")
+            self.last_error = e
+            return 0
+    
+    def replace_document(self, doc_id, chunks, file_hash=None):
+        return self.replace_documents({doc_id: (chunks, file_hash)})
+    
+    def replace_documents(self, documents):
+        """Swap in new chunks for each {doc_id: (chunks, file_hash)} and save once.
+
+        Returns how many chunks were indexed, after dropping duplicates and
+        chunks too short to keep (0 if the update failed).
+        """
+        self.last_error = None
+        try:
+            indexed = 0
+            for doc_id, (chunks, file_hash) in documents.items():
+                self._remove_rows(doc_id)
+                indexed += self._add_records(chunks, doc_id=doc_id)
+                if file_hash:
+                    self.doc_hashes[doc_id] = file_hash
+            self._maybe_compact()
+            self.save_embeddings()
+            return indexed
+        except Exception as e:
+            print(f"❌ Error replacing documents: {e}")
+            self.last_error = e
+            return 0
     
     def clean_text(self, text):
         if not text:
@@ -156,19 +630,54 @@ class EmbeddingModel:
             print(f"❌ Error cleaning text: {e}")
             return ""
     
+    def _search_many(self, queries, top_k, similarity_threshold):
+        """Top chunk ids per query: vector hits above the threshold, fused with BM25 hits by rank.
+
+        A BM25 hit only takes part if it also passed the vector threshold or
+        it contains an identifier from the query (see identifier_terms).
+        Sharing one ordinary word with the query is not enough, so a query
+        with no relevant chunk still returns nothing.
+        """
+        exclude = self._exclude()
+        if self.lexical is None:
+            return [ids for ids, _ in self.index.search_many(queries, top_k, similarity_threshold, exclude)]
+        from models.bm25_index import identifier_terms
+
+        depth = top_k * self.fusion_depth
+        vector_hits = self.index.search_many(queries, depth, similarity_threshold, exclude)
+        lexical_hits = self.lexical.search_many(queries, depth, exclude)
+        results = []
+        for query, (vector_ids, _), (lexical_ids, _) in zip(queries, vector_hits, lexical_hits):
+            allowed = set(vector_ids.tolist())
+            identifiers = identifier_terms(query)
+            if identifiers:
+                allowed.update(self.lexical.search(" ".join(identifiers), depth, exclude)[0].tolist())
+            lexical_ids = [idx for idx in lexical_ids.tolist() if idx in allowed]
+            results.append(reciprocal_rank_fusion([vector_ids, lexical_ids], top_k, self.rrf_k))
+        return results
+    
     def find_similar(self, query, top_k=5, similarity_threshold=0.3):
-        if not self.is_fitted or not self.documents:
+        return [record.text for record in self.find_similar_records(query, top_k, similarity_threshold)]
+    
+    def find_similar_records(self, query, top_k=5, similarity_threshold=0.3):
+        """Like find_similar, but returns ChunkRecords so answers can cite sources"""
+        if not self.is_fitted or not self.n_live:
             return []
         try:
             cleaned_query = self.clean_text(query)
-            query_vector = self.vectorizer.transform([cleaned_query])
-            similarities = cosine_similarity(query_vector, self.tfidf_matrix).flatten()
-            top_indices = np.argsort(similarities)[::-1][:top_k]
-            results = []
-            for idx in top_indices:
-                if similarities[idx] > similarity_threshold:
-                    results.append(self.documents[idx])
-            return results
+            return [self.records[idx] for idx in self._search_many([cleaned_query], top_k, similarity_threshold)[0]]
         except Exception as e:
             print(f"❌ Error finding similar text: {e}")
             return []
+    
+    def find_similar_many(self, queries, top_k=5, similarity_threshold=0.3):
+        """Batched find_similar: one list of chunks per query, in order"""
+        if not self.is_fitted or not self.n_live:
+            return [[] for _ in queries]
+        try:
+            cleaned_queries = [self.clean_text(query) for query in queries]
+            hits = self._search_many(cleaned_queries, top_k, similarity_threshold)
+            return [[self.documents[idx] for idx in top_indices] for top_indices in hits]
+        except Exception as e:
+            print(f"❌ Error finding similar text: {e}")
+            return [[] for _ in queries]
@@ -0,0 +1,45 @@
+# models/index_files.py
+import json
+import os
+
+import numpy as np
+
+
+def write_json(path, data):
+    """Write JSON to a temporary file and move it into place atomically"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def save_index(directory, arrays, meta):
+    """Save {name: array} as name.npy files, then meta.json.
+
+    Every file is written to a temporary path and renamed into place. The
+    manifest goes last, so a crash mid-save leaves a stale checksum and the
+    next load rebuilds instead of reading half-written arrays.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        tmp_path = os.path.join(directory, f"{name}.tmp.npy")
+        np.save(tmp_path, array)
+        os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+    write_json(os.path.join(directory, "meta.json"), meta)
+
+
+def load_meta(directory, version, checksum):
+    """The saved meta.json, or None if it is missing, of another version or stale"""
+    meta_path = os.path.join(directory, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+    if meta.get("version") != version or meta.get("checksum") != checksum:
+        return None
+    return meta
+
+
+def load_array(directory, name, mmap=True):
+    """Memory-map name.npy (mmap=False reads a private copy that can be changed in place)"""
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r' if mmap else None)
@@ -118,62 +118,282 @@ class ChatModel:
 '''
 
 # models/llm.py
-from groq import Groq
+import threading
+import time
+from collections import namedtuple
 from config.config import load_config
-import requests
-import json
+from utils import http_client
+from models.router import ProviderRouter
+from models.scheduler import INTERACTIVE, RateLimitExceeded, request_tokens, retry_after
+from utils.tokens import estimate_tokens
+
+# What a backend returns to the router: the answer and the provider's token
+# counts ({"prompt_tokens", "completion_tokens", "total_tokens"}, or None)
+Completion = namedtuple("Completion", ["text", "usage"])
+
+def _usage(response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
+
+def _add_usage(total, usage):
+    """Token counts summed over the calls that make up one answer"""
+    if usage is None or total is None:
+        return total if usage is None else usage
+    return {key: total[key] + usage[key] for key in total}
+
+def _total_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
 
 class ChatModel:
-    def __init__(self, provider=None, model_name=None):
+    def __init__(self, provider=None, model_name=None, cache=None, scheduler=None):
         config = load_config()
         self.provider = provider or config.get("llm_provider", "groq")
         self.model_name = model_name or config.get("model_name", "gemma2-9b-it")
+        self.hf_model = "HuggingFaceH4/zephyr-7b-beta"
+        self.cache = cache
+        # Shared RequestScheduler: keeps every Groq call in the process under the rate limits
+        self.scheduler = scheduler
+        self.groq_backend = None
         
         if self.provider == "groq":
             try:
-                self.client = Groq(api_key=config.get("groq_api_key"))
-                self.client.models.list()
+                # Imported here: the SDK is slow to import and only Groq needs it
+                from groq import Groq
+                # With a scheduler, 429s go back through its queue and Retry-After
+                # handling instead of the SDK's own retries, which bypass the budget
+                max_retries = 0 if self.scheduler is not None else 2
+                self.client = Groq(api_key=config.get("groq_api_key"), max_retries=max_retries)
+                self.groq_backend = f"groq/{self.model_name}"
+                # The connectivity check is a network round trip; keep it off
+                # the construction path and let the router react once it reports back
+                self.health_check = threading.Thread(target=self._check_groq, daemon=True)
             except Exception as e:
                 print(f"Groq init failed: {e}. Falling back to Hugging Face.")
                 self.provider = "huggingface"
-                self.hf_model = "HuggingFaceH4/zephyr-7b-beta"
         elif self.provider == "openai":
             print("⚠️ OpenAI requires billing. Falling back to Hugging Face.")
             self.provider = "huggingface"
-            self.hf_model = "HuggingFaceH4/zephyr-7b-beta"
         elif self.provider == "gemini":
             print("⚠️ Gemini requires billing. Falling back to Hugging Face.")
             self.provider = "huggingface"
-            self.hf_model = "HuggingFaceH4/zephyr-7b-beta"
         else:
             self.provider = "huggingface"
-            self.hf_model = "HuggingFaceH4/zephyr-7b-beta"
+        
+        # Every request goes to the fastest healthy backend; Hugging Face is
+        # always there as the fallback, and Groq is retried once it recovers
+        backends = []
+        if self.groq_backend:
+            backends.append((self.groq_backend, self._groq_completion))
+        backends.append((f"huggingface/{self.hf_model}", self._huggingface_completion))
+        self.router = ProviderRouter(
+            backends,
+            failure_threshold=config.get("llm_failure_threshold", 3),
+            cooldown=config.get("llm_cooldown", 30.0),
+            hedge=config.get("llm_hedge", False),
+        )
+        if self.groq_backend:
+            self.health_check.start()
     
-    def generate_response(self, prompt, context=None, response_mode="concise"):
+    def _check_groq(self):
         try:
-            if self.provider == "groq":
-                return self._generate_groq_response(prompt, context, response_mode)
-            else:
-                return self._generate_huggingface_response(prompt, context, response_mode)
+            self.client.models.list()
+        except Exception as e:
+            print(f"Groq health check failed: {e}. Routing to Hugging Face until it recovers.")
+            self.router.trip(self.groq_backend)
+    
+    def _groq_available(self):
+        return self.groq_backend is not None and self.router.stats[self.groq_backend].available()
+    
+    def _cache_model(self):
+        return self.model_name if self.provider == "groq" else self.hf_model
+    
+    def generate_response(self, prompt, context=None, response_mode="concise", priority=INTERACTIVE):
+        return self.generate_response_detailed(prompt, context, response_mode, priority)["answer"]
+    
+    def generate_response_detailed(self, prompt, context=None, response_mode="concise", priority=INTERACTIVE):
+        """generate_response plus where the answer came from and what it cost.
+
+        Returns {"answer", "backend", "cached", "usage", "error"}. usage holds
+        the provider's token counts, or estimates marked "estimated": True
+        when the backend reports none. A cached answer costs no tokens.
+        """
+        result = {"answer": None, "backend": None, "cached": False, "usage": None, "error": None}
+        if self.cache is not None:
+            cached = self.cache.get(prompt, response_mode, self._cache_model(), context)
+            if cached is not None:
+                result.update(answer=cached, cached=True,
+                              usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0})
+                return result
+        try:
+            backend, completion = self.router.generate(prompt, context, response_mode, priority)
+        except Exception as e:
+            result.update(answer=f"❌ Error generating response: {str(e)}", error=str(e))
+            return result
+        if self.cache is not None and backend == self.groq_backend:
+            self.cache.put(prompt, response_mode, self._cache_model(), completion.text, context)
+        usage = completion.usage
+        if usage is None:
+            prompt_tokens = estimate_tokens(self._build_system_message(context, response_mode) + prompt)
+            completion_tokens = estimate_tokens(completion.text or "")
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                     "total_tokens": prompt_tokens + completion_tokens, "estimated": True}
+        result.update(answer=completion.text, backend=backend, usage=usage)
+        return result
+    
+    def generate_response_stream(self, prompt, context=None, response_mode="concise", priority=INTERACTIVE):
+        """Yield the answer as it is generated (Hugging Face answers arrive in one piece)"""
+        if self.cache is not None:
+            cached = self.cache.get(prompt, response_mode, self._cache_model(), context)
+            if cached is not None:
+                yield cached
+                return
+        # Take the half-open trial slot like router.generate does, so a
+        # recovering Groq gets one stream at a time
+        if self._groq_available() and self.router.claim(self.groq_backend):
+            parts = []
+            start = time.perf_counter()
+            ok = None
+            try:
+                for token in self._generate_groq_stream(prompt, context, response_mode, priority):
+                    parts.append(token)
+                    yield token
+                ok = True
+            except RateLimitExceeded:
+                # Queue too long: answer from another backend rather than wait
+                pass
+            except Exception as e:
+                ok = False
+                error = e
+            finally:
+                if ok is None:
+                    # Turned away by the scheduler or abandoned by the reader: nothing learnt
+                    self.router.release(self.groq_backend)
+                else:
+                    self.router.record(self.groq_backend, time.perf_counter() - start, ok)
+            if ok:
+                if self.cache is not None:
+                    self.cache.put(prompt, response_mode, self._cache_model(), "".join(parts), context)
+                return
+            if parts:
+                yield f"\n\n❌ Error generating response: {str(error)}"
+                return
+            # Nothing shown yet, so another backend can still answer
+        try:
+            yield self.router.generate(prompt, context, response_mode, priority)[1].text
+        except Exception as e:
+            yield f"❌ Error generating response: {str(e)}"
+    
+    def generate_response_with_tools(self, prompt, context=None, response_mode="concise", max_rounds=3,
+                                     priority=INTERACTIVE):
+        """Like generate_response, but the model may call the portfolio analytics tools.
+
+        Goes through the router like any other request. Only Groq supports
+        tools; if it is down the fallback answers without them.
+        """
+        cache_mode = f"{response_mode}+tools"
+        if self.cache is not None:
+            cached = self.cache.get(prompt, cache_mode, self._cache_model(), context)
+            if cached is not None:
+                return cached
+        try:
+            backend, completion = self.router.generate(prompt, context, response_mode, priority, max_rounds)
         except Exception as e:
             return f"❌ Error generating response: {str(e)}"
+        if self.cache is not None and backend == self.groq_backend:
+            self.cache.put(prompt, cache_mode, self._cache_model(), completion.text, context)
+        return completion.text
     
-    def _generate_groq_response(self, prompt, context, response_mode):
+    def _groq_request(self, prompt, context, response_mode):
         system_message = self._build_system_message(context, response_mode)
         messages = [
             {"role": "system", "content": system_message},
             {"role": "user", "content": prompt}
         ]
-        response = self.client.chat.completions.create(
+        return dict(
             model=self.model_name,
             messages=messages,
             temperature=0.7 if response_mode == "detailed" else 0.3,
             max_tokens=700 if response_mode == "detailed" else 150,
             top_p=0.9
         )
-        return response.choices[0].message.content
     
-    def _generate_huggingface_response(self, prompt, context, response_mode):
+    def _scheduled(self, call, tokens, priority):
+        """Run one Groq API call under the shared rate limits (directly if there is no scheduler)"""
+        if self.scheduler is None:
+            return call()
+        return self.scheduler.run(call, tokens, priority, usage=_total_tokens)
+    
+    def _groq_completion(self, prompt, context, response_mode, priority=INTERACTIVE, tool_rounds=0):
+        """One Groq answer. With tool_rounds > 0 the model may first call the
+        portfolio analytics tools that many times; the results go back to it
+        and the last round asks for a text answer."""
+        if tool_rounds:
+            # Imported here: the analytics load NumPy and most requests use no tools
+            from models.portfolio_analytics import TOOLS, call_tool
+        request = self._groq_request(prompt, context, response_mode)
+        messages = request.pop("messages")
+        usage = None
+        for round_number in range(tool_rounds + 1):
+            tools = dict(tools=TOOLS, tool_choice="auto") if round_number < tool_rounds else {}
+            response = self._scheduled(
+                lambda: self.client.chat.completions.create(messages=messages, **tools, **request),
+                request_tokens(messages, request["max_tokens"]), priority,
+            )
+            usage = _add_usage(usage, _usage(response))
+            message = response.choices[0].message
+            if not message.tool_calls:
+                break
+            messages.append({
+                "role": "assistant",
+                "content": message.content or "",
+                "tool_calls": [
+                    {"id": call.id, "type": "function",
+                     "function": {"name": call.function.name, "arguments": call.function.arguments}}
+                    for call in message.tool_calls
+                ],
+            })
+            for call in message.tool_calls:
+                messages.append({
+                    "role": "tool",
+                    "tool_call_id": call.id,
+                    "content": call_tool(call.function.name, call.function.arguments),
+                })
+        return Completion(message.content, usage)
+    
+    def _generate_groq_stream(self, prompt, context, response_mode, priority=INTERACTIVE):
+        request = self._groq_request(prompt, context, response_mode)
+        tokens = request_tokens(request["messages"], request["max_tokens"])
+        ticket = self.scheduler.acquire(tokens, priority) if self.scheduler is not None else None
+        parts = []
+        try:
+            # The SDK parses the SSE stream; GROQ_BASE_URL can point it at a mock server
+            stream = self.client.chat.completions.create(stream=True, **request)
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+        except Exception as e:
+            if ticket is not None and getattr(e, "status_code", None) == 429:
+                self.scheduler.backoff(retry_after(getattr(e, "response", None)))
+            raise
+        finally:
+            if ticket is not None:
+                # Streams report no usage here; charge the prompt plus what was generated
+                self.scheduler.settle(ticket, tokens - request["max_tokens"] + estimate_tokens("".join(parts)))
+    
+    def _huggingface_completion(self, prompt, context, response_mode, priority=INTERACTIVE, tool_rounds=0):
+        # No tool calling here: tool requests are answered from the prompt alone
+        return Completion(self._request_huggingface(prompt, context, response_mode), None)
+    
+    def _request_huggingface(self, prompt, context, response_mode):
+        """One Hugging Face inference call; raises on failure so the router can count it"""
         API_URL = f"https://api-inference.huggingface.co/models/{self.hf_model}"
         instruction = (
             "Provide a concise answer (1-2 short paragraphs): "
@@ -184,18 +404,15 @@ class ChatModel:
             full_prompt = f"Context: {context}\n\nQuestion: {prompt}\n{instruction}"
         else:
             full_prompt = f"Question: {prompt}\n{instruction}"
-        try:
-            response = requests.post(API_URL, json={"inputs": full_prompt}, timeout=15)
-            response.raise_for_status()
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0:
-                return result[0].get("generated_text", str(result[0]))
-            elif isinstance(result, dict):
-                return result.get("generated_text", str(result))
-            else:
-                return "⚠️ No response generated."
-        except Exception as e:
-            return f"⚠️ Hugging Face error: {str(e)}"
+        response = http_client.post(API_URL, json={"inputs": full_prompt}, timeout=(3.05, 15))
+        response.raise_for_status()
+        result = response.json()
+        if isinstance(result, list) and len(result) > 0:
+            return result[0].get("generated_text", str(result[0]))
+        elif isinstance(result, dict):
+            return result.get("generated_text", str(result))
+        else:
+            return "⚠️ No response generated."
     
     def _build_system_message(self, context, response_mode):
         base_message = "You are a helpful financial advisor chatbot. Provide clear, accurate advice."
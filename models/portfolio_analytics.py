@@ -0,0 +1,326 @@
+# models/portfolio_analytics.py
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def simple_returns(prices):
+    """Period-over-period returns of a (T,) or (T, assets) price array"""
+    prices = np.asarray(prices, dtype=float)
+    return prices[1:] / prices[:-1] - 1
+
+
+def log_returns(prices):
+    prices = np.asarray(prices, dtype=float)
+    return np.diff(np.log(prices), axis=0)
+
+
+def annualized_return(returns, periods_per_year=TRADING_DAYS):
+    """Geometric annual return per column of a returns array"""
+    returns = np.asarray(returns, dtype=float)
+    growth = np.prod(1 + returns, axis=0)
+    return growth ** (periods_per_year / returns.shape[0]) - 1
+
+
+def annualized_volatility(returns, periods_per_year=TRADING_DAYS):
+    return np.std(returns, axis=0, ddof=1) * np.sqrt(periods_per_year)
+
+
+def covariance_matrix(returns, periods_per_year=TRADING_DAYS):
+    """Annualized covariance of a (T, assets) returns array"""
+    return np.atleast_2d(np.cov(np.asarray(returns, dtype=float), rowvar=False)) * periods_per_year
+
+
+def sharpe_ratio(returns, risk_free_rate=0.0, periods_per_year=TRADING_DAYS):
+    """Annualized Sharpe ratio; risk_free_rate is an annual rate"""
+    excess = np.asarray(returns, dtype=float) - risk_free_rate / periods_per_year
+    return np.mean(excess, axis=0) / np.std(excess, axis=0, ddof=1) * np.sqrt(periods_per_year)
+
+
+def max_drawdown(prices):
+    """Largest peak-to-trough fall (as a negative fraction) per column of a price array"""
+    prices = np.asarray(prices, dtype=float)
+    peaks = np.maximum.accumulate(prices, axis=0)
+    return np.min(prices / peaks - 1, axis=0)
+
+
+def portfolio_returns(returns, weights):
+    """Returns of a fixed-weight (daily rebalanced) portfolio"""
+    weights = np.asarray(weights, dtype=float)
+    return np.asarray(returns, dtype=float) @ (weights / weights.sum())
+
+
+def efficient_frontier(expected_returns, cov, n_portfolios=5000, risk_free_rate=0.0, seed=None):
+    """Sample long-only portfolios and locate the max-Sharpe and min-volatility ones.
+
+    Weights are drawn from a flat Dirichlet, so all portfolios are scored
+    with two matrix products instead of a loop.
+    """
+    expected_returns = np.asarray(expected_returns, dtype=float)
+    cov = np.asarray(cov, dtype=float)
+    rng = np.random.default_rng(seed)
+    weights = rng.dirichlet(np.ones(len(expected_returns)), size=n_portfolios)
+    returns = weights @ expected_returns
+    volatility = np.sqrt(np.einsum("ij,jk,ik->i", weights, cov, weights))
+    sharpe = (returns - risk_free_rate) / volatility
+    best, safest = np.argmax(sharpe), np.argmin(volatility)
+    return {
+        "weights": weights,
+        "returns": returns,
+        "volatility": volatility,
+        "sharpe": sharpe,
+        "max_sharpe": {"weights": weights[best], "return": returns[best], "volatility": volatility[best], "sharpe": sharpe[best]},
+        "min_volatility": {"weights": weights[safest], "return": returns[safest], "volatility": volatility[safest], "sharpe": sharpe[safest]},
+    }
+
+
+def simulate_balances(initial_balance, annual_contribution, years, expected_return, volatility,
+                      n_paths, annual_withdrawal=0.0, withdrawal_start_year=None, seed=None):
+    """(n_paths, years + 1) array of year-end balances under lognormal annual returns.
+
+    The loop runs over years; every path advances in the same vector
+    operation. Contributions stop and withdrawals begin at
+    withdrawal_start_year, and a depleted path stays at zero.
+    """
+    rng = np.random.default_rng(seed)
+    # Lognormal with the requested arithmetic mean and standard deviation
+    sigma2 = np.log1p((volatility / (1 + expected_return)) ** 2)
+    mu = np.log1p(expected_return) - sigma2 / 2
+    growth = np.exp(rng.normal(mu, np.sqrt(sigma2), size=(n_paths, years)))
+
+    start = years if withdrawal_start_year is None else withdrawal_start_year
+    cash_flow = np.where(np.arange(years) < start, annual_contribution, -annual_withdrawal)
+    balances = np.empty((n_paths, years + 1))
+    balances[:, 0] = initial_balance
+    for year in range(years):
+        balances[:, year + 1] = np.maximum(balances[:, year] * growth[:, year] + cash_flow[year], 0.0)
+    return balances
+
+
+def _simulate_shard(args):
+    return simulate_balances(*args)
+
+
+def monte_carlo_retirement(initial_balance, annual_contribution=0.0, years=30, expected_return=0.06,
+                           volatility=0.15, n_paths=10000, annual_withdrawal=0.0, withdrawal_start_year=None,
+                           seed=None, max_workers=1):
+    """Monte Carlo projection summarised as yearly percentiles and a success rate.
+
+    With max_workers > 1 the paths are split across a process pool; each
+    shard gets an independent child seed, so results are reproducible for
+    a given seed and worker count.
+    """
+    max_workers = min(max_workers or os.cpu_count() or 1, n_paths)
+    if max_workers <= 1:
+        balances = simulate_balances(initial_balance, annual_contribution, years, expected_return, volatility,
+                                     n_paths, annual_withdrawal, withdrawal_start_year, seed)
+    else:
+        seeds = np.random.SeedSequence(seed).spawn(max_workers)
+        shards = [
+            (initial_balance, annual_contribution, years, expected_return, volatility,
+             len(paths), annual_withdrawal, withdrawal_start_year, child)
+            for paths, child in zip(np.array_split(np.arange(n_paths), max_workers), seeds)
+        ]
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            balances = np.concatenate(list(pool.map(_simulate_shard, shards)))
+
+    final = balances[:, -1]
+    return {
+        "paths": n_paths,
+        "years": years,
+        "percentiles": {p: np.percentile(balances, p, axis=0) for p in (10, 50, 90)},
+        "final_median": float(np.median(final)),
+        "final_p10": float(np.percentile(final, 10)),
+        "final_p90": float(np.percentile(final, 90)),
+        "success_rate": float(np.mean(final > 0)),
+    }
+
+
+# --- Tool calling -------------------------------------------------------------
+# JSON-schema specs in the OpenAI/Groq "tools" format, and a dispatcher that
+# turns the model's arguments into plain JSON results.
+
+# Tool arguments come from the model, so they are bounded before anything is
+# allocated: a projection holds TOOL_PATHS x years floats, a price history
+# assets x periods.
+TOOL_PATHS = 10000
+MAX_TOOL_YEARS = 100
+MAX_TOOL_ASSETS = 50
+MAX_TOOL_PERIODS = 10000
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "retirement_projection",
+            "description": "Monte Carlo projection of a retirement balance. Returns median, 10th and 90th percentile "
+                           "balances at the end and the probability the money never runs out.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "initial_balance": {"type": "number", "description": "Current savings in dollars"},
+                    "annual_contribution": {"type": "number", "description": "Dollars added per year until withdrawals start"},
+                    "years": {"type": "integer", "description": f"Years to simulate (1-{MAX_TOOL_YEARS})"},
+                    "expected_return": {"type": "number", "description": "Expected annual return, e.g. 0.06"},
+                    "volatility": {"type": "number", "description": "Annual volatility, e.g. 0.15"},
+                    "annual_withdrawal": {"type": "number", "description": "Dollars withdrawn per year once withdrawals start"},
+                    "withdrawal_start_year": {"type": "integer", "description": "Year withdrawals begin (omit for none)"},
+                },
+                "required": ["initial_balance", "years"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "portfolio_risk",
+            "description": "Annualized return, volatility, Sharpe ratio and max drawdown of a portfolio "
+                           "from periodic price histories of its assets.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "prices": {
+                        "type": "array",
+                        "items": {"type": "array", "items": {"type": "number"}},
+                        "description": f"One price history per asset (at most {MAX_TOOL_ASSETS} assets of {MAX_TOOL_PERIODS} "
+                                       "prices), oldest first, all the same length",
+                    },
+                    "weights": {"type": "array", "items": {"type": "number"}, "description": "Portfolio weight per asset"},
+                    "periods_per_year": {"type": "integer", "description": "252 for daily, 52 weekly, 12 monthly prices"},
+                    "risk_free_rate": {"type": "number", "description": "Annual risk-free rate, e.g. 0.04"},
+                },
+                "required": ["prices"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "efficient_frontier",
+            "description": "Sample long-only portfolios of the given assets and return the max-Sharpe "
+                           "and minimum-volatility weights.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "assets": {"type": "array", "items": {"type": "string"}},
+                    "expected_returns": {"type": "array", "items": {"type": "number"}, "description": "Annual, per asset"},
+                    "volatilities": {"type": "array", "items": {"type": "number"}, "description": "Annual, per asset"},
+                    "correlations": {
+                        "type": "array",
+                        "items": {"type": "array", "items": {"type": "number"}},
+                        "description": "Correlation matrix (defaults to 0.3 between all pairs)",
+                    },
+                    "risk_free_rate": {"type": "number"},
+                },
+                "required": ["expected_returns", "volatilities"],
+            },
+        },
+    },
+]
+
+
+def _rounded(value, digits=4):
+    return [round(float(v), digits) for v in np.atleast_1d(value)]
+
+
+def _bounded_int(name, value, low, high):
+    """value as an int, or ValueError (returned to the model) if it is outside [low, high]"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None or not low <= number <= high:
+        raise ValueError(f"{name} must be a number from {low} to {high}, got {value!r}")
+    return int(number)
+
+
+def _bounded_list(name, values, min_length, max_length):
+    if not isinstance(values, list) or not min_length <= len(values) <= max_length:
+        raise ValueError(f"{name} must be a list of {min_length} to {max_length} values")
+    return values
+
+
+def _bounded_matrix(name, rows, max_rows, min_columns, max_columns):
+    """A list of equal-length number lists as a float array, checked before it is built"""
+    _bounded_list(name, rows, 1, max_rows)
+    for row in rows:
+        _bounded_list(f"each list in {name}", row, min_columns, max_columns)
+    if len({len(row) for row in rows}) != 1:
+        raise ValueError(f"the lists in {name} must all have the same length")
+    return np.asarray(rows, dtype=float)
+
+
+def _retirement_projection(initial_balance, years, annual_contribution=0.0, expected_return=0.06, volatility=0.15,
+                           annual_withdrawal=0.0, withdrawal_start_year=None):
+    years = _bounded_int("years", years, 1, MAX_TOOL_YEARS)
+    if withdrawal_start_year is not None:
+        withdrawal_start_year = _bounded_int("withdrawal_start_year", withdrawal_start_year, 0, years)
+    result = monte_carlo_retirement(initial_balance, annual_contribution, years, expected_return, volatility,
+                                    n_paths=TOOL_PATHS, annual_withdrawal=annual_withdrawal,
+                                    withdrawal_start_year=withdrawal_start_year, seed=0)
+    return {key: round(result[key], 2) if isinstance(result[key], float) else result[key]
+            for key in ("paths", "years", "final_median", "final_p10", "final_p90", "success_rate")}
+
+
+def _portfolio_risk(prices, weights=None, periods_per_year=TRADING_DAYS, risk_free_rate=0.0):
+    prices = _bounded_matrix("prices", prices, MAX_TOOL_ASSETS, 2, MAX_TOOL_PERIODS).T
+    n = prices.shape[1]
+    weights = np.ones(n) if weights is None else np.asarray(_bounded_list("weights", weights, n, n), dtype=float)
+    periods_per_year = _bounded_int("periods_per_year", periods_per_year, 1, 366)
+    returns = portfolio_returns(simple_returns(prices), weights)
+    value = np.concatenate([[1.0], np.cumprod(1 + returns)])
+    return {
+        "annual_return": round(float(annualized_return(returns, periods_per_year)), 4),
+        "annual_volatility": round(float(annualized_volatility(returns, periods_per_year)), 4),
+        "sharpe_ratio": round(float(sharpe_ratio(returns, risk_free_rate, periods_per_year)), 3),
+        "max_drawdown": round(float(max_drawdown(value)), 4),
+    }
+
+
+def _efficient_frontier(expected_returns, volatilities, assets=None, correlations=None, risk_free_rate=0.0):
+    volatilities = np.asarray(_bounded_list("volatilities", volatilities, 1, MAX_TOOL_ASSETS), dtype=float)
+    n = len(volatilities)
+    expected_returns = _bounded_list("expected_returns", expected_returns, n, n)
+    if correlations is None:
+        correlations = np.full((n, n), 0.3)
+        np.fill_diagonal(correlations, 1.0)
+    elif len(_bounded_matrix("correlations", correlations, n, n, n)) != n:
+        raise ValueError(f"correlations must be a {n}x{n} matrix")
+    cov = np.asarray(correlations, dtype=float) * np.outer(volatilities, volatilities)
+    frontier = efficient_frontier(expected_returns, cov, risk_free_rate=risk_free_rate, seed=0)
+    assets = assets or [f"asset_{i + 1}" for i in range(n)]
+    return {
+        name: {
+            "weights": dict(zip(assets, _rounded(frontier[name]["weights"], 3))),
+            "return": round(float(frontier[name]["return"]), 4),
+            "volatility": round(float(frontier[name]["volatility"]), 4),
+            "sharpe": round(float(frontier[name]["sharpe"]), 3),
+        }
+        for name in ("max_sharpe", "min_volatility")
+    }
+
+
+_TOOL_FUNCTIONS = {
+    "retirement_projection": _retirement_projection,
+    "portfolio_risk": _portfolio_risk,
+    "efficient_frontier": _efficient_frontier,
+}
+
+
+def call_tool(name, arguments):
+    """Run a tool call from the model; returns a JSON string (errors included, so the model can recover)"""
+    try:
+        if isinstance(arguments, str):
+            arguments = json.loads(arguments or "{}")
+        if name not in _TOOL_FUNCTIONS:
+            raise ValueError(f"unknown tool {name}")
+        arguments = {key: value for key, value in arguments.items() if value is not None}
+        return json.dumps(_TOOL_FUNCTIONS[name](**arguments))
+    except MemoryError:
+        return json.dumps({"error": "the request is too large to compute"})
+    except Exception as e:
+        return json.dumps({"error": str(e)})
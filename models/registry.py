@@ -0,0 +1,271 @@
+# models/registry.py
+import hashlib
+import os
+import shutil
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from config.config import load_config
+from models.llm import ChatModel
+from models.response_cache import ResponseCache
+from models.scheduler import RequestScheduler
+
+# models.embeddings is imported where a model is first built: it loads NumPy,
+# and importing this module should not
+
+# Re-entrant: a factory may build the resources it depends on (get_chat_model -> get_response_cache)
+_lock = threading.RLock()
+_resources = {}
+
+
+def get_resource(key, factory):
+    """Build factory() once per process and hand the same object to every session.
+
+    Streamlit reruns the script for every interaction and every user, but
+    modules are imported once per process, so this dict outlives sessions.
+    The lock makes concurrent first calls build the resource only once.
+    """
+    resource = _resources.get(key)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(key)
+            if resource is None:
+                resource = factory()
+                _resources[key] = resource
+    return resource
+
+
+def clear_resources():
+    with _lock:
+        _resources.clear()
+
+
+class SharedEmbeddingModel:
+    """Read-mostly EmbeddingModel shared by all sessions.
+
+    Readers always see a complete index: writers apply their change to a
+    copy and swap it in with a single attribute assignment. Writers are
+    serialised so concurrent uploads never lose each other's chunks. A
+    change that fails is discarded, as if it had never been applied.
+    """
+
+    def __init__(self, model):
+        self._model = model
+        self._write_lock = threading.Lock()
+
+    @property
+    def current(self):
+        return self._model
+
+    def update(self, mutate):
+        with self._write_lock:
+            if not self._model.store.is_latest():
+                # Another process sharing this partition committed since we loaded
+                fresh = self._model.copy()
+                fresh.load_embeddings()
+                self._model = fresh
+            draft = self._model.copy()
+            result = mutate(draft)
+            # The mutators print and swallow their errors; a failed draft is
+            # dropped so readers and the next writer keep the committed state
+            if draft.last_error is None:
+                self._model = draft
+            return result
+
+    def find_similar(self, query, top_k=5, similarity_threshold=0.3):
+        return self._model.find_similar(query, top_k, similarity_threshold)
+
+    def find_similar_records(self, query, top_k=5, similarity_threshold=0.3):
+        return self._model.find_similar_records(query, top_k, similarity_threshold)
+
+    def find_similar_many(self, queries, top_k=5, similarity_threshold=0.3):
+        return self._model.find_similar_many(queries, top_k, similarity_threshold)
+
+    def has_file(self, doc_id, file_hash):
+        return self._model.has_file(doc_id, file_hash)
+
+    def add_document(self, text, chunks):
+        return self.update(lambda model: model.add_document(text, chunks))
+
+    def replace_documents(self, documents):
+        return self.update(lambda model: model.replace_documents(documents))
+
+    def replace_document(self, doc_id, chunks, file_hash=None):
+        return self.update(lambda model: model.replace_document(doc_id, chunks, file_hash))
+
+    def remove_document(self, doc_id):
+        return self.update(lambda model: model.remove_document(doc_id))
+
+
+class NamespacedEmbeddingModels:
+    """One SharedEmbeddingModel per namespace, loaded on first use.
+
+    Each namespace (a user or session) has its own chunk store and index,
+    so a query only scores that namespace's chunks and one user's uploads
+    never show up in another's results. At most max_resident partitions
+    stay in memory; the least recently used one is dropped and reloaded
+    from disk when it is next needed. A dropped partition that a session
+    still holds is handed out again instead of being reloaded, so there is
+    only ever one copy, and one write lock, per namespace in the process.
+
+    Sessions are not told when they end, so partitions on disk under root
+    that nobody has used for ttl seconds are deleted (checked at most every
+    prune_interval seconds, on a cold load). ttl=None keeps them forever.
+    """
+
+    def __init__(self, backend=None, max_resident=16, root=None, ttl=None, prune_interval=3600, clock=time.time):
+        self.backend = backend
+        self.max_resident = max_resident
+        self.root = root
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self.clock = clock
+        self.encoder = None
+        self._resident = OrderedDict()
+        # Evicted partitions stay reachable here for as long as a session holds them
+        self._live = weakref.WeakValueDictionary()
+        self._loading = {}
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, namespace):
+        with self._lock:
+            shared = self._resident.get(namespace) or self._live.get(namespace)
+            if shared is not None:
+                self._keep(namespace, shared)
+                return shared
+            # Concurrent cold loads of one namespace wait for the first instead of racing it
+            loaded = self._loading.get(namespace)
+            if loaded is None:
+                loaded = self._loading[namespace] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            loaded.wait()
+            return self.get(namespace)
+        try:
+            # Load outside the lock so one user's cold load never blocks other users
+            from models.embeddings import EmbeddingModel
+
+            self._prune()
+            model = EmbeddingModel(backend=self.backend, encoder=self.encoder, namespace=namespace)
+            self._touch(namespace)
+            with self._lock:
+                # The dense encoder is the expensive part; every partition shares the first one
+                self.encoder = self.encoder or model.encoder
+                shared = self._live[namespace] = SharedEmbeddingModel(model)
+                self._keep(namespace, shared)
+                return shared
+        finally:
+            with self._lock:
+                del self._loading[namespace]
+            loaded.set()
+
+    def _keep(self, namespace, shared):
+        self._resident[namespace] = shared
+        self._resident.move_to_end(namespace)
+        while len(self._resident) > self.max_resident:
+            self._resident.popitem(last=False)
+
+    def _touch(self, namespace):
+        # Cold loads bump the partition directory's mtime; writes bump its subdirectories
+        if self.root is not None:
+            from models.embeddings import namespace_dirname
+
+            path = os.path.join(self.root, namespace_dirname(namespace))
+            if os.path.isdir(path):
+                os.utime(path)
+
+    def _prune(self):
+        """Delete on-disk partitions idle for longer than ttl that no session holds"""
+        now = self.clock()
+        if self.root is None or self.ttl is None or now < self._next_prune or not os.path.isdir(self.root):
+            return
+        self._next_prune = now + self.prune_interval
+        from models.embeddings import namespace_dirname
+
+        with self._lock:
+            in_use = {namespace_dirname(namespace) for namespace in (*self._live.keys(), *self._loading)}
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                try:
+                    if name not in in_use and now - _last_used(path) > self.ttl:
+                        shutil.rmtree(path)
+                except OSError as e:
+                    print(f"❌ Error removing idle partition {name}: {e}")
+
+    def resident(self):
+        with self._lock:
+            return list(self._resident)
+
+
+def _last_used(path):
+    return max([os.path.getmtime(path)] + [os.path.getmtime(entry.path) for entry in os.scandir(path)])
+
+
+def _build_partitions(backend):
+    config = load_config()
+    ttl = config.get("namespace_ttl", 86400)
+    return NamespacedEmbeddingModels(
+        backend,
+        max_resident=config.get("namespace_cache_size", 16),
+        root=config.get("namespace_dir", "data/namespaces"),
+        ttl=ttl if ttl > 0 else None,
+    )
+
+
+def get_embedding_model(backend=None, namespace=None):
+    """The shared model, or the partition for namespace when one is given"""
+    if namespace is None:
+        from models.embeddings import EmbeddingModel
+
+        return get_resource(
+            ("embedding_model", backend),
+            lambda: SharedEmbeddingModel(EmbeddingModel(backend=backend)),
+        )
+    partitions = get_resource(
+        ("embedding_partitions", backend),
+        lambda: _build_partitions(backend),
+    )
+    return partitions.get(namespace)
+
+
+def get_response_cache():
+    def build():
+        config = load_config()
+        return ResponseCache(
+            max_entries=config.get("response_cache_size", 1024),
+            ttl=config.get("response_cache_ttl", 86400),
+            db_path=config.get("response_cache_path"),
+            semantic=config.get("response_cache_semantic", True),
+        )
+    return get_resource("response_cache", build)
+
+
+def get_scheduler(api_key=None):
+    """The Groq rate limiter shared by everything in this process using api_key.
+
+    Provider limits apply per key, so sessions that bring their own key get
+    their own budget.
+    """
+    def build():
+        config = load_config()
+        return RequestScheduler(
+            requests_per_minute=config.get("groq_requests_per_minute", 30),
+            tokens_per_minute=config.get("groq_tokens_per_minute", 6000),
+            max_wait=config.get("llm_max_queue_wait", 30.0),
+            batch_max_wait=config.get("llm_batch_max_queue_wait", float("inf")),
+        )
+    key = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+    return get_resource(("scheduler", key), build)
+
+
+def get_chat_model(provider=None, model_name=None):
+    def build():
+        scheduler = get_scheduler(load_config().get("groq_api_key"))
+        return ChatModel(provider=provider, model_name=model_name, cache=get_response_cache(), scheduler=scheduler)
+    return get_resource(("chat_model", provider, model_name), build)
@@ -0,0 +1,191 @@
+# models/response_cache.py
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Words that flip a question's meaning; a semantic hit must agree on them exactly
+_NEGATIONS = frozenset({"not", "no", "never", "nor", "none", "neither", "without", "cannot"})
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def normalize_prompt(prompt):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r'\s+', ' ', prompt or "").strip().lower().rstrip("?!. ")
+
+
+def _digest(*parts):
+    return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def make_prompt_vectorizer(n_features=2 ** 18):
+    """Word and bigram counts that keep stop words, digits and one-letter tokens.
+
+    Unlike the retrieval vectorizer nothing is dropped: "buy" and "not buy",
+    or "5%" and "9%", must not look alike here.
+    """
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    return HashingVectorizer(
+        token_pattern=r"(?u)\b\w+\b",
+        ngram_range=(1, 2),
+        n_features=n_features,
+        alternate_sign=False,
+        norm='l2',
+    )
+
+
+def guard_terms(prompt):
+    """Numbers and negations in a prompt; two prompts can only share an answer if these match"""
+    prompt = prompt.replace("n't", " not")
+    words = re.findall(r"\w+", prompt)
+    return (
+        tuple(sorted(_NUMBER.findall(prompt))),
+        tuple(sorted(word for word in words if word in _NEGATIONS)),
+    )
+
+
+class ResponseCache:
+    """LRU + TTL cache of LLM answers with an exact and a semantic tier.
+
+    Entries are scoped by (response mode, model, context hash), so an answer
+    is only ever reused for the same retrieved context. Within a scope the
+    exact tier matches the normalised prompt; the semantic tier matches
+    prompts whose word and bigram vectors have cosine >= similarity_threshold
+    and whose numbers and negations are identical (see guard_terms). With
+    semantic=False only exact matches are served. With db_path set, entries
+    are also written to SQLite and reloaded on start.
+    """
+
+    def __init__(self, max_entries=1024, ttl=86400, similarity_threshold=0.9, db_path=None, clock=time.time,
+                 semantic=True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.semantic = semantic
+        self.clock = clock
+        # Built on the first lookup so creating the cache stays import-free
+        self.vectorizer = None
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> (scope, prompt, response, created, vector, guards)
+        self._entries = OrderedDict()
+        self._scopes = {}
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, scope TEXT, prompt TEXT, response TEXT, created REAL)"
+            )
+            self._db.commit()
+            self._load()
+
+    def _vector(self, prompt):
+        if self.vectorizer is None:
+            self.vectorizer = make_prompt_vectorizer()
+        return self.vectorizer.transform([prompt])
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT key, scope, prompt, response, created FROM responses "
+            "WHERE created >= ? ORDER BY created DESC LIMIT ?",
+            (self.clock() - self.ttl, self.max_entries),
+        ).fetchall()
+        for key, scope, prompt, response, created in reversed(rows):
+            self._store(key, scope, prompt, response, created)
+
+    def _store(self, key, scope, prompt, response, created):
+        if key in self._entries:
+            self._drop(key)
+        vector = self._vector(prompt) if self.semantic else None
+        self._entries[key] = (scope, prompt, response, created, vector, guard_terms(prompt))
+        self._scopes.setdefault(scope, set()).add(key)
+
+    def _drop(self, key):
+        scope = self._entries.pop(key)[0]
+        keys = self._scopes.get(scope)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._scopes[scope]
+        return key
+
+    def _evict(self):
+        now = self.clock()
+        expired = {key for key, entry in self._entries.items() if now - entry[3] > self.ttl}
+        overflow = len(self._entries) - len(expired) - self.max_entries
+        for key in self._entries:  # least recently used first
+            if overflow <= 0:
+                break
+            if key not in expired:
+                expired.add(key)
+                overflow -= 1
+        for key in expired:
+            self._drop(key)
+        if expired and self._db is not None:
+            self._db.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in expired])
+            self._db.commit()
+
+    def get(self, prompt, response_mode, model, context=None):
+        """Cached answer for this prompt and context, or None"""
+        normalized = normalize_prompt(prompt)
+        scope = _digest(response_mode, model, context or "")
+        key = _digest(scope, normalized)
+        with self._lock:
+            now = self.clock()
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[3] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits["exact"] += 1
+                return entry[2]
+
+            guards = guard_terms(normalized)
+            candidates = [
+                k for k in self._scopes.get(scope, ())
+                if now - self._entries[k][3] <= self.ttl and self._entries[k][5] == guards
+            ]
+            if self.semantic and candidates:
+                import scipy.sparse as sp
+
+                similarities = (sp.vstack([self._entries[k][4] for k in candidates]) @ self._vector(normalized).T).toarray().ravel()
+                best = similarities.argmax()
+                if similarities[best] >= self.similarity_threshold:
+                    self._entries.move_to_end(candidates[best])
+                    self.hits["semantic"] += 1
+                    return self._entries[candidates[best]][2]
+            self.misses += 1
+            return None
+
+    def put(self, prompt, response_mode, model, response, context=None):
+        if not response:
+            return
+        normalized = normalize_prompt(prompt)
+        scope = _digest(response_mode, model, context or "")
+        key = _digest(scope, normalized)
+        with self._lock:
+            created = self.clock()
+            self._store(key, scope, normalized, response, created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, scope, prompt, response, created) VALUES (?, ?, ?, ?, ?)",
+                    (key, scope, normalized, response, created),
+                )
+                self._db.commit()
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            hits = self.hits["exact"] + self.hits["semantic"]
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.hits["exact"],
+                "semantic_hits": self.hits["semantic"],
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,232 @@
+# models/router.py
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from models.scheduler import RateLimitExceeded
+
+# Hedged and abandoned calls finish here in the background
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+
+class ProviderStats:
+    """Rolling latency/error window plus a circuit breaker for one backend.
+
+    The window keeps the last `window` calls no older than max_age seconds,
+    so a backend that stopped being used forgets its bad record and gets
+    tried again. The breaker opens after failure_threshold consecutive
+    failures and stays open for cooldown seconds. After that one trial
+    request is let through (half-open): success closes it with a clean
+    window, failure opens it again.
+    """
+
+    def __init__(self, window=50, failure_threshold=3, cooldown=30.0, max_age=300.0, clock=time.monotonic):
+        self.samples = deque(maxlen=window)  # (timestamp, latency seconds, ok)
+        self.max_age = max_age
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.consecutive_failures = 0
+        self.open_until = None
+        self.trial_in_flight = False
+
+    def record(self, latency, ok):
+        self.trial_in_flight = False
+        if ok:
+            if self.open_until is not None:
+                self.samples.clear()
+            self.consecutive_failures = 0
+            self.open_until = None
+        else:
+            self.consecutive_failures += 1
+            if self.open_until is not None or self.consecutive_failures >= self.failure_threshold:
+                self.trip()
+        self.samples.append((self.clock(), latency, ok))
+
+    def _recent(self):
+        cutoff = self.clock() - self.max_age
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return self.samples
+
+    def trip(self):
+        self.open_until = self.clock() + self.cooldown
+
+    @property
+    def state(self):
+        if self.open_until is None:
+            return "closed"
+        return "open" if self.clock() < self.open_until else "half_open"
+
+    def available(self):
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.trial_in_flight)
+
+    def claim(self):
+        """Take the single half-open trial slot; False if another request holds it"""
+        if self.trial_in_flight:
+            return False
+        self.trial_in_flight = True
+        return True
+
+    @property
+    def error_rate(self):
+        samples = self._recent()
+        if not samples:
+            return 0.0
+        return sum(1 for _, _, ok in samples if not ok) / len(samples)
+
+    def latencies(self):
+        return sorted(latency for _, latency, ok in self._recent() if ok)
+
+    @property
+    def mean_latency(self):
+        latencies = self.latencies()
+        return sum(latencies) / len(latencies) if latencies else None
+
+    @property
+    def p95_latency(self):
+        latencies = self.latencies()
+        return latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None
+
+    def summary(self):
+        return {
+            "state": self.state,
+            "requests": len(self._recent()),
+            "error_rate": self.error_rate,
+            "mean_latency": self.mean_latency,
+            "p95_latency": self.p95_latency,
+        }
+
+
+class ProviderRouter:
+    """Send each request to the fastest healthy backend, failing over in order.
+
+    backends is a list of (name, generate) pairs in preference order;
+    generate(*args) returns the answer or raises. A backend whose breaker
+    just went half-open gets the next request as its trial. Healthy
+    backends (error rate <= max_error_rate) are ranked by mean latency; one
+    with no recent successful calls goes ahead of every measured backend
+    it is preferred over, so the preferred provider is re-tried once its
+    old record expires. Degraded backends come last. With hedge=True a request still running after the
+    primary's p95 latency (at least hedge_min_delay) is also sent to the
+    next backend and the first answer wins.
+    """
+
+    def __init__(self, backends, window=50, failure_threshold=3, cooldown=30.0, max_age=300.0, max_error_rate=0.5,
+                 hedge=False, hedge_min_delay=1.0, clock=time.monotonic):
+        self.backends = list(backends)
+        self.stats = {
+            name: ProviderStats(window, failure_threshold, cooldown, max_age, clock) for name, _ in self.backends
+        }
+        self.max_error_rate = max_error_rate
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self._lock = threading.Lock()
+
+    def record(self, name, latency, ok):
+        with self._lock:
+            self.stats[name].record(latency, ok)
+
+    def trip(self, name):
+        """Open a backend's breaker now, e.g. after a failed health check"""
+        with self._lock:
+            self.stats[name].trip()
+
+    def claim(self, name):
+        """Take name's trial slot if its breaker is half-open; False if another request holds it.
+
+        A caller that gets True must end with record() or, if it learnt
+        nothing about the backend, release().
+        """
+        with self._lock:
+            stats = self.stats[name]
+            return stats.state != "half_open" or stats.claim()
+
+    def release(self, name):
+        """Give back a trial slot without counting a success or a failure"""
+        with self._lock:
+            self.stats[name].trial_in_flight = False
+
+    def ranked(self):
+        """Backends to try for the next request, best first"""
+        with self._lock:
+            trials, measured, unmeasured, degraded = [], [], [], []
+            for order, backend in enumerate(self.backends):
+                stats = self.stats[backend[0]]
+                if not stats.available():
+                    continue
+                if stats.state == "half_open":
+                    trials.append(backend)
+                elif stats.error_rate > self.max_error_rate:
+                    degraded.append((stats.error_rate, order, backend))
+                elif stats.mean_latency is None:
+                    unmeasured.append((order, backend))
+                else:
+                    measured.append((stats.mean_latency, order, backend))
+            healthy = sorted(measured)
+            for order, backend in unmeasured:
+                position = next((i for i, item in enumerate(healthy) if item[1] > order), len(healthy))
+                healthy.insert(position, (None, order, backend))
+            ranked = trials + [item[2] for item in healthy] + [item[2] for item in sorted(degraded)]
+            if not ranked:
+                # Every breaker is open: try whichever reopens first rather than fail outright
+                ranked = [min(self.backends, key=lambda backend: self.stats[backend[0]].open_until)]
+            return ranked
+
+    def _call(self, backend, args):
+        name, generate = backend
+        if not self.claim(name):
+            raise RuntimeError(f"{name} is already running its half-open trial")
+        start = time.perf_counter()
+        try:
+            result = generate(*args)
+        except RateLimitExceeded:
+            # Turned away by our own rate limiter: nothing was learnt about the backend
+            self.release(name)
+            raise
+        except Exception:
+            self.record(name, time.perf_counter() - start, False)
+            raise
+        self.record(name, time.perf_counter() - start, True)
+        return name, result
+
+    def _hedge_delay(self, name):
+        p95 = self.stats[name].p95_latency
+        return max(self.hedge_min_delay, p95 or 0.0)
+
+    def generate(self, *args):
+        """(backend name, answer) from the first backend that succeeds; raises if all fail"""
+        candidates = self.ranked()
+        last_error = None
+        i = 0
+        while i < len(candidates):
+            primary = candidates[i]
+            i += 1
+            if not self.hedge or i >= len(candidates):
+                try:
+                    return self._call(primary, args)
+                except Exception as e:
+                    last_error = e
+                    continue
+
+            pending = {_executor.submit(self._call, primary, args)}
+            done, pending = wait(pending, timeout=self._hedge_delay(primary[0]))
+            if not done:
+                pending.add(_executor.submit(self._call, candidates[i], args))
+                i += 1
+            while done or pending:
+                for future in done:
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        last_error = e
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        raise RuntimeError(f"All LLM providers failed: {last_error}")
+
+    def summary(self):
+        with self._lock:
+            return {name: stats.summary() for name, stats in self.stats.items()}
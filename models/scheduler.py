@@ -0,0 +1,211 @@
+# models/scheduler.py
+import heapq
+import itertools
+import threading
+import time
+
+from utils.tokens import estimate_tokens
+
+# Lower runs first: a user waiting in the chat UI goes ahead of queued batch work
+INTERACTIVE = 0
+BATCH = 1
+
+
+class RateLimitExceeded(Exception):
+    """The queue is too long to serve a request within its max_wait"""
+
+    def __init__(self, wait):
+        super().__init__(f"LLM request queue is full: estimated wait {wait:.0f}s")
+        self.wait = wait
+
+
+class TokenBucket:
+    """Continuously refilling budget of rate_per_minute units, bursting up to capacity.
+
+    The level may go negative when a request turns out to cost more than
+    its estimate; later requests then wait for the debt to refill.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self.clock = clock
+        self.level = self.capacity
+        self.updated = clock()
+
+    def refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.level
+
+    def time_until(self, amount, ahead=0):
+        """Seconds until amount units are available (0 if they are now).
+
+        ahead is what earlier requests take first; the bucket has to refill
+        all of it. A request bigger than the bucket is let through once the
+        bucket is full and runs the level negative, so only the capacity of
+        amount itself is waited for.
+        """
+        missing = ahead + min(amount, self.capacity) - self.refill()
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate if self.rate else float("inf")
+
+    def take(self, amount):
+        self.refill()
+        self.level -= amount
+
+
+class Ticket:
+    def __init__(self, priority, seq, tokens):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.queued_at = None
+        self.granted_at = None
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class RequestScheduler:
+    """Process-wide requests/min and tokens/min budget for one LLM provider.
+
+    Every call first takes a ticket with acquire(). Tickets are granted
+    strictly in (priority, arrival) order, once both buckets can cover the
+    next request. A new request whose estimated wait is longer than its
+    max_wait is rejected at once with RateLimitExceeded, so callers can show
+    the wait or fall back instead of piling up. After the call, settle()
+    replaces the token estimate with the real usage. backoff() pauses
+    everything after the provider answers 429.
+
+    Each bucket holds `burst` of a minute's budget and refills the rest
+    evenly. No sliding minute can then go over the limit, whether the
+    provider counts with a bucket or a window.
+
+    clock and wait are injectable. wait(condition, timeout) blocks until
+    notified or timeout, and a test can pass one that advances a fake clock.
+    """
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=6000, max_wait=30.0, burst=0.1,
+                 batch_max_wait=float("inf"), clock=time.monotonic, wait=None):
+        self.clock = clock
+        self.requests = TokenBucket(requests_per_minute * (1 - burst), max(1.0, requests_per_minute * burst), clock)
+        self.tokens = TokenBucket(tokens_per_minute * (1 - burst), max(1.0, tokens_per_minute * burst), clock)
+        self.max_wait = max_wait
+        # Batch callers bound their own concurrency, so by default they queue rather than fail
+        self.batch_max_wait = batch_max_wait
+        self.paused_until = 0.0
+        self._wait = wait or (lambda condition, timeout: condition.wait(timeout))
+        self._queue = []
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self.granted = 0
+        self.rejected = 0
+
+    def _delay(self, tokens, requests_ahead=0, tokens_ahead=0):
+        return max(
+            self.paused_until - self.clock(),
+            self.requests.time_until(1, requests_ahead),
+            self.tokens.time_until(tokens, tokens_ahead),
+            0.0,
+        )
+
+    def _estimate(self, tokens, priority):
+        # Every ticket that would be granted first drains the buckets before this one
+        ahead = [ticket for ticket in self._queue if ticket.priority <= priority]
+        return self._delay(tokens, len(ahead), sum(ticket.tokens for ticket in ahead))
+
+    def estimate_wait(self, tokens, priority=INTERACTIVE):
+        """Seconds a request of this size and priority would queue if submitted now"""
+        with self._condition:
+            return self._estimate(tokens, priority)
+
+    def acquire(self, tokens, priority=INTERACTIVE, max_wait=None):
+        """Block until the request may be sent; raises RateLimitExceeded instead of waiting too long"""
+        if max_wait is None:
+            max_wait = self.max_wait if priority < BATCH else self.batch_max_wait
+        with self._condition:
+            wait = self._estimate(tokens, priority)
+            if wait > max_wait:
+                self.rejected += 1
+                raise RateLimitExceeded(wait)
+            ticket = Ticket(priority, next(self._seq), tokens)
+            ticket.queued_at = self.clock()
+            heapq.heappush(self._queue, ticket)
+            while True:
+                timeout = None
+                if self._queue[0] is ticket:
+                    timeout = self._delay(tokens)
+                    if timeout <= 0:
+                        heapq.heappop(self._queue)
+                        self.requests.take(1)
+                        self.tokens.take(tokens)
+                        ticket.granted_at = self.clock()
+                        self.granted += 1
+                        # The next ticket in line becomes the head
+                        self._condition.notify_all()
+                        return ticket
+                self._wait(self._condition, timeout)
+
+    def settle(self, ticket, used_tokens):
+        """Charge the real token usage of a finished request against its estimate"""
+        if used_tokens is None:
+            return
+        with self._condition:
+            self.tokens.take(used_tokens - ticket.tokens)
+            ticket.tokens = used_tokens
+
+    def backoff(self, seconds):
+        """Hold every queued request for seconds, e.g. after a 429 with Retry-After"""
+        with self._condition:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+            self._condition.notify_all()
+
+    def run(self, call, tokens, priority=INTERACTIVE, max_wait=None, usage=None, retries=1):
+        """acquire(), call(), then settle() with usage(result) when given.
+
+        A 429 pauses the queue for the provider's Retry-After and the call
+        goes back in line, up to retries times.
+        """
+        for attempt in range(retries + 1):
+            ticket = self.acquire(tokens, priority, max_wait)
+            try:
+                result = call()
+            except Exception as e:
+                if getattr(e, "status_code", None) != 429:
+                    raise
+                self.backoff(retry_after(getattr(e, "response", None)))
+                if attempt == retries:
+                    raise
+                continue
+            if usage is not None:
+                self.settle(ticket, usage(result))
+            return result
+
+    def summary(self):
+        with self._condition:
+            return {
+                "queued": len(self._queue),
+                "queued_batch": sum(1 for ticket in self._queue if ticket.priority >= BATCH),
+                "requests_available": round(self.requests.refill(), 2),
+                "tokens_available": round(self.tokens.refill()),
+                "paused_for": max(0.0, self.paused_until - self.clock()),
+                "granted": self.granted,
+                "rejected": self.rejected,
+            }
+
+
+def request_tokens(messages, max_tokens):
+    """Budget for a chat request: estimated prompt tokens plus the completion limit"""
+    return sum(estimate_tokens(message.get("content") or "") for message in messages) + max_tokens
+
+
+def retry_after(response, default=1.0):
+    """Seconds from a 429 response's Retry-After header, else default"""
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", default))
+    except (TypeError, ValueError):
+        return default
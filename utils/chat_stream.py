@@ -0,0 +1,67 @@
+# utils/chat_stream.py
+import json
+
+from utils import http_client
+
+GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+
+def iter_sse_data(lines):
+    """Yield the data payload of each server-sent event.
+
+    Multi-line data fields are joined with newlines as the SSE spec says;
+    comments and other fields (event:, id:, retry:) are ignored.
+    """
+    data = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if field == "data":
+            data.append(value[1:] if value.startswith(" ") else value)
+    if data:
+        yield "\n".join(data)
+
+
+def iter_completion_tokens(lines):
+    """Yield content deltas from an OpenAI-compatible chat completion stream"""
+    for data in iter_sse_data(lines):
+        if data == "[DONE]":
+            return
+        event = json.loads(data)
+        if "error" in event:
+            raise RuntimeError(event["error"].get("message", str(event["error"])))
+        for choice in event.get("choices", []):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
+
+
+def open_chat_stream(api_key, payload, api_url=GROQ_CHAT_URL, timeout=60):
+    """POST a streaming chat completion and return the open response.
+
+    Only the connection and headers are awaited here; the body is read
+    lazily by iter_completion_tokens(response.iter_lines()). A 429 is
+    returned at once rather than retried: the caller holds a scheduler
+    ticket and hands the Retry-After to RequestScheduler.backoff().
+    """
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream",
+    }
+    return http_client.post(
+        api_url,
+        headers=headers,
+        json={**payload, "stream": True},
+        timeout=(http_client.DEFAULT_TIMEOUT[0], timeout),
+        stream=True,
+        retry_statuses=http_client.SERVER_ERRORS,
+    )
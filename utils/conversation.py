@@ -0,0 +1,104 @@
+# utils/conversation.py
+from utils.tokens import estimate_tokens
+
+# Role markers and separators the chat template adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_PREFIX = "Earlier in this conversation:\n"
+
+
+class ConversationWindow:
+    """Token-budgeted chat history for one conversation.
+
+    Keep one instance per session and call build() on every rerun. Token
+    counts are cached per message and turns that fall out of the window are
+    folded into a running summary exactly once, so each rerun only costs
+    work for the new messages plus a newest-to-oldest walk that stops at
+    the budget.
+
+    The default summary keeps the first summary_line_chars characters of
+    each dropped turn (newest lines win when the summary budget is full);
+    pass summarize(previous_summary, dropped_messages) to use an LLM instead.
+    """
+
+    def __init__(self, budget_tokens=3000, summary_tokens=300, summary_line_chars=160,
+                 count_tokens=estimate_tokens, summarize=None):
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.summary_line_chars = summary_line_chars
+        self.count_tokens = count_tokens
+        self.summarize = summarize
+        self.reset()
+
+    def reset(self):
+        self._counts = []
+        self._summary = ""
+        self._summarized_upto = 0
+
+    def _message_tokens(self, messages):
+        if len(messages) < len(self._counts):
+            # History was cleared or rewritten; start over
+            self.reset()
+        for message in messages[len(self._counts):]:
+            self._counts.append(self.count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS)
+        return self._counts
+
+    def _fold_into_summary(self, dropped):
+        if self.summarize is not None:
+            self._summary = self.summarize(self._summary, dropped)
+            return
+        lines = self._summary.split("\n") if self._summary else []
+        for message in dropped:
+            text = " ".join(message["content"].split())
+            if len(text) > self.summary_line_chars:
+                text = text[:self.summary_line_chars].rstrip() + "…"
+            lines.append(f"{message['role']}: {text}")
+        while len(lines) > 1 and self.count_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        self._summary = "\n".join(lines)
+
+    def _truncate(self, content, tokens):
+        # Keep the start of an oversized message (e.g. a pasted portfolio);
+        # the marker counts against the same budget
+        marker = "\n[…truncated]"
+        tokens = max(tokens - self.count_tokens(marker), 0)
+        max_chars = max(0, len(content) * tokens // max(self.count_tokens(content), 1))
+        return content[:max_chars].rstrip() + marker
+
+    def _fit(self, counts, budget):
+        """Index of the oldest unsummarized message such that it and everything after fit budget"""
+        first = len(counts)
+        used = 0
+        while first > self._summarized_upto and used + counts[first - 1] <= budget:
+            first -= 1
+            used += counts[first]
+        return first
+
+    def build(self, system_prompt, messages):
+        """API messages: system prompt, summary of older turns, then the newest turns that fit"""
+        counts = self._message_tokens(messages)
+        budget = self.budget_tokens - self.count_tokens(system_prompt) - MESSAGE_OVERHEAD_TOKENS
+        first = self._fit(counts, budget)
+        if self._summary or first > self._summarized_upto:
+            # A summary will be sent, and it grows with the turns dropped below,
+            # so its whole budget is reserved before sizing the window
+            budget -= self.summary_tokens + self.count_tokens(SUMMARY_PREFIX) + MESSAGE_OVERHEAD_TOKENS
+            first = self._fit(counts, budget)
+
+        window = [{"role": m["role"], "content": m["content"]} for m in messages[first:]]
+        if not window and messages:
+            # The newest message alone is over budget: send a truncated copy
+            newest = messages[-1]
+            window = [{"role": newest["role"], "content": self._truncate(newest["content"], max(budget - MESSAGE_OVERHEAD_TOKENS, 1))}]
+            first = len(messages) - 1
+
+        if first > self._summarized_upto:
+            self._fold_into_summary(messages[self._summarized_upto:first])
+            self._summarized_upto = first
+            if self.count_tokens(self._summary) > self.summary_tokens:
+                # A custom summarize() may overshoot its reservation
+                self._summary = self._truncate(self._summary, self.summary_tokens)
+
+        api_messages = [{"role": "system", "content": system_prompt}]
+        if self._summary:
+            api_messages.append({"role": "system", "content": SUMMARY_PREFIX + self._summary})
+        return api_messages + window
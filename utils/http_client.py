@@ -0,0 +1,118 @@
+# utils/http_client.py
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) seconds; read is the gap allowed between bytes, not the total
+DEFAULT_TIMEOUT = (3.05, 30)
+SERVER_ERRORS = (500, 502, 503, 504)
+RETRY_STATUSES = (429,) + SERVER_ERRORS
+
+_lock = threading.Lock()
+_sessions = {}
+_retries = {}
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(url, pool_maxsize=32):
+    """One keep-alive Session per scheme://host, shared by every caller in the process"""
+    key = _host_key(url)
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                # Retries are handled in request() so they can honour Retry-After with jitter
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+                session.mount(key, adapter)
+                _sessions[key] = session
+                _retries[key] = 0
+    return session
+
+
+def _retry_delay(response, attempt, backoff):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    # Full jitter: spreads retries from many sessions hitting the same 429
+    return random.uniform(0, backoff * (2 ** attempt))
+
+
+def request(method, url, timeout=DEFAULT_TIMEOUT, retries=2, backoff=0.5, max_delay=10.0,
+            retry_statuses=RETRY_STATUSES, **kwargs):
+    """Send a request over the pooled session for url's host.
+
+    Responses with a status in retry_statuses (429 and 5xx by default) are
+    retried up to `retries` times with jittered exponential backoff (or the
+    server's Retry-After). Connection errors
+    are retried too, since the request never reached the server; read
+    timeouts are not, so a slow completion is never billed twice.
+    """
+    session = get_session(url)
+    key = _host_key(url)
+    for attempt in range(retries + 1):
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.ConnectionError:
+            if attempt == retries:
+                raise
+            response = None
+        else:
+            if response.status_code not in retry_statuses or attempt == retries:
+                return response
+        delay = min(_retry_delay(response, attempt, backoff), max_delay)
+        if response is not None:
+            response.close()
+        with _lock:
+            _retries[key] += 1
+        time.sleep(delay)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def connection_stats():
+    """Per-host requests, new connections opened, reuse ratio and retries"""
+    stats = {}
+    with _lock:
+        sessions = dict(_sessions)
+    for key, session in sessions.items():
+        requests_sent = connections = 0
+        pools = session.get_adapter(key).poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is not None:
+                requests_sent += pool.num_requests
+                connections += pool.num_connections
+        stats[key] = {
+            "requests": requests_sent,
+            "connections": connections,
+            "reuse_ratio": 1 - connections / requests_sent if requests_sent else 0.0,
+            "retries": _retries.get(key, 0),
+        }
+    return stats
+
+
+def close_sessions():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _retries.clear()
@@ -0,0 +1,83 @@
+# utils/orchestrator.py
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.rag_utils import retrieve_relevant_chunks
+from utils.web_search import web_search_results
+
+# Not the loop's default executor: asyncio.run() waits for that one on exit,
+# which would make an abandoned stage block the caller after all.
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="answer-stage")
+
+
+async def _run_stage(name, func, args, deadline, timings):
+    """Run a blocking stage on a worker thread; on timeout or error return None.
+
+    A stage that misses its deadline is abandoned, not killed: its thread
+    finishes in the background (a late web search still fills the cache).
+    """
+    start = time.perf_counter()
+    status = "ok"
+    result = None
+    try:
+        future = asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+        result = await asyncio.wait_for(future, timeout=deadline)
+    except asyncio.TimeoutError:
+        status = "timeout"
+    except Exception as e:
+        status = f"error: {e}"
+    timings[name] = {"seconds": time.perf_counter() - start, "status": status}
+    return result
+
+
+async def gather_context_async(query, embedding_model=None, use_web_search=True,
+                               retrieval_deadline=1.0, search_deadline=3.0, num_web_results=3):
+    """Run local retrieval and web search concurrently, each under its own deadline.
+
+    Returns {"chunks": [...], "web_results": [...], "timings": {...}}; a stage
+    that timed out or failed contributes an empty list, so the answer can go
+    ahead with whatever context arrived in time.
+    """
+    timings = {}
+    start = time.perf_counter()
+    stages = []
+    if embedding_model is not None:
+        stages.append(_run_stage("retrieval", retrieve_relevant_chunks, (query, embedding_model), retrieval_deadline, timings))
+    else:
+        stages.append(asyncio.sleep(0, result=None))
+    if use_web_search:
+        stages.append(_run_stage("web_search", web_search_results, (query, num_web_results), search_deadline, timings))
+    else:
+        stages.append(asyncio.sleep(0, result=None))
+
+    chunks, web_results = await asyncio.gather(*stages)
+    timings["context_total"] = {"seconds": time.perf_counter() - start, "status": "ok"}
+    return {"chunks": chunks or [], "web_results": web_results or [], "timings": timings}
+
+
+def gather_context(query, embedding_model=None, use_web_search=True, **deadlines):
+    """Blocking wrapper for callers without an event loop (e.g. the Streamlit script)"""
+    return asyncio.run(gather_context_async(query, embedding_model, use_web_search, **deadlines))
+
+
+def assemble_context(gathered, max_chars=6000):
+    """Prompt context from retrieved chunks first, then web results, capped at max_chars"""
+    sections = []
+    if gathered["chunks"]:
+        sections.append("From your documents:\n" + "\n---\n".join(gathered["chunks"]))
+    if gathered["web_results"]:
+        sections.append("From the web:\n" + "\n".join(gathered["web_results"]))
+    return "\n\n".join(sections)[:max_chars] or None
+
+
+async def answer_async(query, chat_model, embedding_model=None, use_web_search=True,
+                       response_mode="concise", **deadlines):
+    """Gather context concurrently, then call the LLM; returns (answer, timings)"""
+    gathered = await gather_context_async(query, embedding_model, use_web_search, **deadlines)
+    context = assemble_context(gathered)
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    answer = await loop.run_in_executor(_executor, chat_model.generate_response, query, context, response_mode)
+    gathered["timings"]["llm"] = {"seconds": time.perf_counter() - start, "status": "ok"}
+    return answer, gathered["timings"]
@@ -0,0 +1,283 @@
+# utils/portfolio_csv.py
+import csv
+import io
+from itertools import islice
+
+# NumPy is imported by the functions that parse and total rows: the app
+# imports this module on every start just for is_csv_file and the formatter
+
+# Lower-cased header names seen in common brokerage exports, per column role
+COLUMN_ALIASES = {
+    "symbol": ("symbol", "ticker", "security", "instrument", "security symbol"),
+    "action": ("action", "transaction type", "trans type", "activity", "side"),
+    "quantity": ("quantity", "qty", "shares", "units"),
+    "price": ("price", "trade price", "execution price", "price per share", "unit price"),
+    "amount": ("amount", "net amount", "value", "total", "proceeds"),
+    "fees": ("fees", "fee", "commission", "fees & comm", "commissions"),
+    "asset_class": ("asset class", "asset_class", "asset type", "security type", "class"),
+}
+TEXT_ROLES = ("symbol", "action", "asset_class")
+
+BUY_WORDS = ("buy", "bought", "purchase", "reinvest")
+SELL_WORDS = ("sell", "sold")
+INCOME_WORDS = ("dividend", "interest", "distribution")
+
+CSV_TYPES = ("text/csv", "application/csv", "application/vnd.ms-excel")
+
+_TOTALS = ("buy_qty", "buy_cost", "sell_qty", "sell_proceeds", "fees", "income", "last_price")
+
+
+def is_csv_file(uploaded_file):
+    return uploaded_file.type in CSV_TYPES or uploaded_file.name.lower().endswith(".csv")
+
+
+def detect_columns(header):
+    """Map column roles to header positions; roles without a matching header are left out"""
+    names = [name.strip().lower() for name in header]
+    columns = {}
+    for role, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in names:
+                columns[role] = names.index(alias)
+                break
+    return columns
+
+
+def parse_numbers(values):
+    """Float array from strings like "1,234.50", "$-3" or "(12.00)"; blanks and junk become NaN"""
+    import numpy as np
+
+    try:
+        return np.array(values, dtype=float)
+    except ValueError:
+        pass
+    text = np.char.strip(np.array(values, dtype=str))
+    negative = np.char.startswith(text, "(")
+    for char in ("$", ",", "(", ")"):
+        text = np.char.replace(text, char, "")
+    numbers = np.full(len(text), np.nan)
+    valid = np.char.str_len(text) > 0
+    try:
+        numbers[valid] = text[valid].astype(float)
+    except ValueError:
+        for i in np.flatnonzero(valid):
+            try:
+                numbers[i] = float(text[i])
+            except ValueError:
+                pass
+    numbers[negative] = -np.abs(numbers[negative])
+    return numbers
+
+
+def _action_masks(actions, *word_lists):
+    """One mask per word list, marking actions that contain any of its words.
+
+    Each distinct action string is classified once, so the per-row cost is
+    a single np.unique.
+    """
+    import numpy as np
+
+    uniques, inverse = np.unique(actions, return_inverse=True)
+    lowered = [str(value).lower() for value in uniques]
+    return [
+        np.array([any(word in value for word in words) for value in lowered], dtype=bool)[inverse]
+        for words in word_lists
+    ]
+
+
+def iter_csv_blocks(uploaded_file, chunk_rows=50000):
+    """Yield {role: array} per block of chunk_rows rows.
+
+    Text roles come back as string arrays and the rest as float arrays.
+    Only one block of rows is alive at a time, so memory stays bounded by
+    chunk_rows however long the export is.
+    """
+    import numpy as np
+
+    uploaded_file.seek(0)
+    text = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if not header:
+            return
+        columns = detect_columns(header)
+        if "symbol" not in columns or "quantity" not in columns:
+            raise ValueError("no symbol or quantity column found")
+        width = len(header)
+        while True:
+            rows = list(islice(reader, chunk_rows))
+            if not rows:
+                return
+            fields = list(zip(*(row for row in rows if len(row) == width)))
+            if not fields:
+                continue
+            yield {
+                role: np.array(fields[position], dtype=str) if role in TEXT_ROLES else parse_numbers(fields[position])
+                for role, position in columns.items()
+            }
+    finally:
+        # Leave the caller's file open
+        text.detach()
+
+
+class PortfolioAggregator:
+    """Running per-symbol totals over blocks of transaction (or position) rows.
+
+    State is a handful of float arrays indexed by symbol, so it grows with
+    the number of distinct symbols, not rows. Realized P&L uses the average
+    cost of all buys in the file; rows without an action column count as
+    buys for positive quantities and sells for negative ones, which also
+    makes a plain positions export come out as its holdings. Market value
+    uses the last price seen per symbol in file order.
+    """
+
+    def __init__(self):
+        import numpy as np
+
+        self.rows = 0
+        self.symbol_ids = {}
+        self.asset_classes = []
+        self.totals = {name: np.zeros(0) for name in _TOTALS}
+
+    def _ids(self, symbols):
+        import numpy as np
+
+        uniques, inverse = np.unique(symbols, return_inverse=True)
+        ids = np.array([
+            self.symbol_ids.setdefault(str(symbol).strip().upper(), len(self.symbol_ids)) for symbol in uniques
+        ], dtype=np.intp)
+        grow = len(self.symbol_ids) - len(self.asset_classes)
+        if grow:
+            self.asset_classes.extend(["Unclassified"] * grow)
+            for name in _TOTALS:
+                self.totals[name] = np.concatenate([self.totals[name], np.full(grow, np.nan if name == "last_price" else 0.0)])
+        return ids[inverse]
+
+    def add(self, block):
+        import numpy as np
+
+        n = len(block["symbol"])
+        self.rows += n
+        ids = self._ids(block["symbol"])
+        size = len(self.symbol_ids)
+        quantity = block["quantity"]
+        amount = block.get("amount", np.full(n, np.nan))
+        price = block.get("price", np.full(n, np.nan))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            price = np.where(np.isnan(price) & (quantity != 0), np.abs(amount) / np.abs(quantity), price)
+
+        if "action" in block:
+            buys, sells, income = _action_masks(block["action"], BUY_WORDS, SELL_WORDS, INCOME_WORDS)
+            sells &= ~buys
+            income &= ~buys & ~sells
+        else:
+            buys, sells, income = quantity > 0, quantity < 0, np.zeros(n, dtype=bool)
+
+        shares = np.nan_to_num(np.abs(quantity))
+        value = np.where(np.isnan(price), np.abs(amount), shares * price)
+        value = np.nan_to_num(value)
+
+        def per_symbol(mask, weights):
+            return np.bincount(ids[mask], weights=weights[mask], minlength=size)
+
+        self.totals["buy_qty"] += per_symbol(buys, shares)
+        self.totals["buy_cost"] += per_symbol(buys, value)
+        self.totals["sell_qty"] += per_symbol(sells, shares)
+        self.totals["sell_proceeds"] += per_symbol(sells, value)
+        self.totals["income"] += per_symbol(income, np.nan_to_num(np.abs(amount)))
+        if "fees" in block:
+            self.totals["fees"] += np.bincount(ids, weights=np.nan_to_num(np.abs(block["fees"])), minlength=size)
+
+        # Last row per symbol with a usable price (and asset class, if given)
+        priced = np.flatnonzero(~np.isnan(price) & (buys | sells | ("action" not in block)))
+        last_row = np.full(size, -1)
+        np.maximum.at(last_row, ids[priced], priced)
+        seen = np.flatnonzero(last_row >= 0)
+        self.totals["last_price"][seen] = price[last_row[seen]]
+        if "asset_class" in block:
+            last_row = np.full(size, -1)
+            np.maximum.at(last_row, ids, np.arange(n))
+            for symbol_id in np.flatnonzero(last_row >= 0):
+                asset_class = str(block["asset_class"][last_row[symbol_id]]).strip()
+                if asset_class:
+                    self.asset_classes[symbol_id] = asset_class
+
+    def summary(self):
+        """Holdings, allocation by asset class and P&L totals as plain Python values"""
+        import numpy as np
+
+        t = self.totals
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg_cost = np.where(t["buy_qty"] > 0, t["buy_cost"] / t["buy_qty"], np.nan)
+        held = t["buy_qty"] - t["sell_qty"]
+        realized = t["sell_proceeds"] - t["sell_qty"] * np.nan_to_num(avg_cost)
+        market_value = np.where(held > 0, held * np.nan_to_num(t["last_price"]), 0.0)
+        unrealized = np.where(held > 0, market_value - held * np.nan_to_num(avg_cost), 0.0)
+
+        symbols = np.array(list(self.symbol_ids), dtype=object)
+        classes = np.array(self.asset_classes, dtype=object)
+        open_positions = np.flatnonzero(held > 1e-9)
+        order = open_positions[np.argsort(-market_value[open_positions], kind="stable")]
+        total_value = float(market_value[open_positions].sum())
+
+        allocation = {}
+        if total_value > 0 and len(open_positions):
+            names, inverse = np.unique(classes[open_positions].astype(str), return_inverse=True)
+            sums = np.bincount(inverse, weights=market_value[open_positions])
+            allocation = {name: float(value / total_value) for name, value in sorted(zip(names, sums), key=lambda item: -item[1])}
+
+        return {
+            "rows": self.rows,
+            "symbols": len(symbols),
+            "holdings": [
+                {
+                    "symbol": symbols[i],
+                    "asset_class": classes[i],
+                    "quantity": float(held[i]),
+                    "avg_cost": float(avg_cost[i]),
+                    "last_price": float(t["last_price"][i]),
+                    "market_value": float(market_value[i]),
+                    "unrealized_pnl": float(unrealized[i]),
+                }
+                for i in order
+            ],
+            "allocation": allocation,
+            "market_value": total_value,
+            "realized_pnl": float(realized.sum()),
+            "unrealized_pnl": float(unrealized.sum()),
+            "income": float(t["income"].sum()),
+            "fees": float(t["fees"].sum()),
+        }
+
+
+def summarize_csv(uploaded_file, chunk_rows=50000):
+    """Portfolio summary dict for a CSV export, or None if it cannot be read"""
+    try:
+        aggregator = PortfolioAggregator()
+        for block in iter_csv_blocks(uploaded_file, chunk_rows):
+            aggregator.add(block)
+        return aggregator.summary() if aggregator.rows else None
+    except Exception as e:
+        print(f"Error summarizing CSV {uploaded_file.name}: {e}")
+        return None
+
+
+def format_portfolio_summary(summary, name=None, max_holdings=10):
+    """Compact text for the LLM context: totals, allocation and the largest holdings"""
+    lines = [f"Portfolio summary{f' from {name}' if name else ''} ({summary['rows']:,} rows, {summary['symbols']} symbols):"]
+    lines.append(
+        f"Market value ${summary['market_value']:,.2f}; unrealized P&L ${summary['unrealized_pnl']:,.2f}; "
+        f"realized P&L ${summary['realized_pnl']:,.2f}; income ${summary['income']:,.2f}; fees ${summary['fees']:,.2f}"
+    )
+    if summary["allocation"]:
+        lines.append("Allocation: " + ", ".join(f"{name} {share:.1%}" for name, share in summary["allocation"].items()))
+    holdings = summary["holdings"]
+    for holding in holdings[:max_holdings]:
+        lines.append(
+            f"- {holding['symbol']} ({holding['asset_class']}): {holding['quantity']:,g} @ ${holding['last_price']:,.2f}"
+            f" = ${holding['market_value']:,.2f}, avg cost ${holding['avg_cost']:,.2f}"
+        )
+    if len(holdings) > max_holdings:
+        lines.append(f"- ...and {len(holdings) - max_holdings} smaller positions")
+    return "\n".join(lines)
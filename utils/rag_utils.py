@@ -1,45 +1,150 @@
 # utils/rag_utils.py
+import io
 import os
-import PyPDF2
-import docx
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
 import re
+from utils.portfolio_csv import format_portfolio_summary, is_csv_file, summarize_csv
+from utils.tokens import CHARS_PER_TOKEN, estimate_tokens
 
-def process_documents(uploaded_files, embedding_model):
-    """Process uploaded documents and add them to the embedding model"""
-    for uploaded_file in uploaded_files:
-        text = extract_text_from_file(uploaded_file)
-        if text:
-            # Split text into chunks (you can adjust chunk size)
-            chunks = split_text_into_chunks(text, chunk_size=500)
-            embedding_model.add_document(text, chunks)
+_WORD = re.compile(r'\S+')
+_SENTENCE_END = re.compile(r'[.!?]+(?=\s+[^\sa-z0-9]|\s*\Z)')
+_ABBREVIATION = re.compile(r'(?:[A-Za-z]\.)+|(?:Inc|Corp|Co|Ltd|Mr|Mrs|Ms|Dr|No|vs|St|Jr|Sr)\.')
 
-def extract_text_from_file(uploaded_file):
-    """Extract text from different file formats"""
+class InMemoryFile(io.BytesIO):
+    """Picklable stand-in for a Streamlit UploadedFile (name, type, bytes)"""
+
+    def __init__(self, name, type, data):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+
+def _extract_payload(name, file_type, data, max_tokens=128, overlap_tokens=16):
+    """Process-pool worker: returns (name, [ChunkRecord], page count).
+
+    Pages are chunked as they are parsed, so only the chunks (not the
+    whole extracted text) are ever held and shipped back.
+    """
+    pages = iter_file_pages(InMemoryFile(name, file_type, data))
+    chunks = list(chunk_pages(pages, doc_id=name, max_tokens=max_tokens, overlap_tokens=overlap_tokens))
+    return name, chunks, len({chunk.page for chunk in chunks})
+
+def file_digest(data):
+    """Content hash of an uploaded file, used for file-level dedup"""
+    return hashlib.sha1(data).hexdigest()
+
+def iter_extracted_files(uploaded_files, max_workers=None, max_tokens=128, overlap_tokens=16, skip=None):
+    """Yield (name, digest, chunks, pages) per file as soon as its extraction finishes.
+
+    Files for which skip(name, digest) is true are never extracted.
+    """
+    payloads, digests = [], {}
+    for f in uploaded_files:
+        data = f.getvalue()
+        digests[f.name] = file_digest(data)
+        if skip is None or not skip(f.name, digests[f.name]):
+            payloads.append((f.name, f.type, data, max_tokens, overlap_tokens))
+    max_workers = min(max_workers or os.cpu_count() or 1, len(payloads))
+    if max_workers <= 1:
+        for payload in payloads:
+            name, chunks, pages = _extract_payload(*payload)
+            yield name, digests[name], chunks, pages
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_extract_payload, *payload) for payload in payloads]
+        for future in as_completed(futures):
+            name, chunks, pages = future.result()
+            yield name, digests[name], chunks, pages
+
+def iter_document_chunks(uploaded_files, stats, progress_callback=None, max_workers=None, max_tokens=128, overlap_tokens=16, skip=None):
+    """Stream (name, digest, chunks) per changed file, calling progress_callback(done, total, name)"""
+    total = len(uploaded_files)
+    extracted = iter_extracted_files(uploaded_files, max_workers, max_tokens, overlap_tokens, skip)
+    done = 0
+    for name, digest, chunks, pages in extracted:
+        done += 1
+        stats["files"] += 1
+        stats["pages"] += pages
+        stats["chunks"] += len(chunks)
+        yield name, digest, chunks
+        if progress_callback:
+            progress_callback(done, total, name)
+    stats["skipped"] = total - done
+
+def process_documents(uploaded_files, embedding_model, progress_callback=None, max_workers=None, max_tokens=128, overlap_tokens=16):
+    """Process uploaded documents and add them to the embedding model.
+
+    Files already indexed with the same name and content are skipped before extraction;
+    a changed file replaces its previous chunks. Extraction runs in a
+    process pool and all documents are committed in one batch, so a
+    multi-file upload costs one index update and one save. Returns
+    ingestion stats including pages per second.
+    """
+    stats = {"files": 0, "pages": 0, "chunks": 0, "skipped": 0}
+    start = time.perf_counter()
+    documents = {
+        name: (chunks, digest)
+        for name, digest, chunks in iter_document_chunks(
+            uploaded_files, stats, progress_callback, max_workers, max_tokens, overlap_tokens,
+            skip=embedding_model.has_file,
+        )
+    }
+    # What was indexed, not what was extracted: duplicate and too-short chunks are dropped
+    stats["chunks"] = embedding_model.replace_documents(documents) if documents else 0
+    stats["seconds"] = time.perf_counter() - start
+    stats["pages_per_sec"] = stats["pages"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+def iter_file_pages(uploaded_file):
+    """Yield (page_number, text) pairs lazily for any supported file type"""
     try:
         if uploaded_file.type == "application/pdf":
-            return extract_text_from_pdf(uploaded_file)
+            yield from iter_pdf_pages(uploaded_file)
         elif uploaded_file.type == "text/plain":
-            return uploaded_file.read().decode("utf-8")
+            yield 1, uploaded_file.read().decode("utf-8")
         elif uploaded_file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-            return extract_text_from_docx(uploaded_file)
+            yield from iter_docx_paragraphs(uploaded_file)
+        elif is_csv_file(uploaded_file):
+            # Index the aggregate summary, not thousands of raw transaction rows
+            summary = summarize_csv(uploaded_file)
+            if summary:
+                yield 1, format_portfolio_summary(summary, uploaded_file.name)
         else:
             print(f"Unsupported file type: {uploaded_file.type}")
-            return None
     except Exception as e:
         print(f"Error extracting text from {uploaded_file.name}: {e}")
-        return None
+
+def iter_pdf_pages(uploaded_file):
+    """Yield (page_number, text) for each PDF page; image-only pages yield nothing"""
+    import PyPDF2
+
+    pdf_reader = PyPDF2.PdfReader(uploaded_file)
+    for page_number, page in enumerate(pdf_reader.pages, 1):
+        text = page.extract_text()
+        if text:
+            yield page_number, text
+
+def iter_docx_paragraphs(uploaded_file):
+    """Yield (page_number, text) per paragraph, counting explicit page breaks"""
+    import docx
+
+    doc = docx.Document(uploaded_file)
+    page_number = 1
+    for paragraph in doc.paragraphs:
+        if paragraph.text:
+            yield page_number, paragraph.text
+        page_number += len(paragraph._p.xpath('.//w:br[@w:type="page"]'))
+
+def extract_text_from_file(uploaded_file):
+    """Extract text from different file formats"""
+    text = "\n".join(text for _, text in iter_file_pages(uploaded_file))
+    return text or None
 
 def extract_text_from_pdf(uploaded_file):
     """Extract text from PDF file"""
     try:
-        pdf_reader = PyPDF2.PdfReader(uploaded_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        return "\n".join(text for _, text in iter_pdf_pages(uploaded_file))
     except Exception as e:
         print(f"Error reading PDF: {e}")
         return None
@@ -47,35 +152,147 @@ def extract_text_from_pdf(uploaded_file):
 def extract_text_from_docx(uploaded_file):
     """Extract text from DOCX file"""
     try:
-        doc = docx.Document(uploaded_file)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        return "\n".join(text for _, text in iter_docx_paragraphs(uploaded_file))
     except Exception as e:
         print(f"Error reading DOCX: {e}")
         return None
 
-def split_text_into_chunks(text, chunk_size=500):
-    """Split text into chunks of approximately chunk_size characters"""
-    chunks = []
-    words = text.split()
+def split_pages_into_chunks(pages, chunk_size=500):
+    """Lazily chunk (page_number, text) pairs into (page_number, chunk) pairs.
+
+    A chunk never spans two pages, so every chunk can cite its page.
+    """
+    current_page = None
     current_chunk = []
     current_size = 0
     
-    for word in words:
-        if current_size + len(word) + 1 > chunk_size and current_chunk:
-            chunks.append(" ".join(current_chunk))
+    for page_number, text in pages:
+        if page_number != current_page and current_chunk:
+            yield current_page, " ".join(current_chunk)
             current_chunk = []
             current_size = 0
+        current_page = page_number
         
-        current_chunk.append(word)
-        current_size += len(word) + 1  # +1 for space
+        for word in text.split():
+            if current_size + len(word) + 1 > chunk_size and current_chunk:
+                yield current_page, " ".join(current_chunk)
+                current_chunk = []
+                current_size = 0
+            
+            current_chunk.append(word)
+            current_size += len(word) + 1  # +1 for space
     
     if current_chunk:
-        chunks.append(" ".join(current_chunk))
-    
-    return chunks
+        yield current_page, " ".join(current_chunk)
+
+def _iter_sentences(text):
+    """Yield (start, end) of each sentence in text.
+
+    A sentence ends at . ! or ? followed by the end of the text, or by
+    whitespace and something other than a lowercase letter or digit. A
+    period inside a figure ("$12.45", "3.8%") therefore never ends one, and
+    neither does the period of an abbreviation ("U.S.", "Inc.").
+    """
+    position = 0
+    for boundary in _SENTENCE_END.finditer(text):
+        preceding = re.search(r'\S+$', text[max(0, boundary.start() - 16):boundary.end()])
+        if boundary.group() == "." and preceding and _ABBREVIATION.fullmatch(preceding.group()):
+            continue
+        first = _WORD.search(text, position, boundary.end())
+        if first:
+            yield first.start(), boundary.end()
+        position = boundary.end()
+    first = _WORD.search(text, position)
+    if first:
+        yield first.start(), len(text.rstrip())
+
+def _iter_sentence_spans(text, max_tokens):
+    """Yield (start, end, tokens) per sentence; overlong sentences split on words.
+
+    A single word longer than max_tokens (a URL, a table row with no
+    spaces) is cut into max_tokens-sized pieces.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    for sentence_start, sentence_end in _iter_sentences(text):
+        tokens = estimate_tokens(text[sentence_start:sentence_end])
+        if tokens <= max_tokens:
+            yield sentence_start, sentence_end, tokens
+            continue
+        start = end = None
+        for word in _WORD.finditer(text, sentence_start, sentence_end):
+            for piece_start in range(word.start(), word.end(), max_chars):
+                piece_end = min(piece_start + max_chars, word.end())
+                if start is not None and estimate_tokens(text[start:piece_end]) > max_tokens:
+                    yield start, end, estimate_tokens(text[start:end])
+                    start = None
+                if start is None:
+                    start = piece_start
+                end = piece_end
+        if start is not None:
+            yield start, end, estimate_tokens(text[start:end])
+
+def _word_tail(text, start, end, max_tokens):
+    """(start, end, tokens) of the trailing whole words of text[start:end] that fit max_tokens"""
+    tail_start = end
+    for word in reversed(list(_WORD.finditer(text, start, end))):
+        if estimate_tokens(text[word.start():end]) > max_tokens:
+            break
+        tail_start = word.start()
+    return tail_start, end, estimate_tokens(text[tail_start:end]) if tail_start < end else 0
+
+def _overlap(text, window, overlap_tokens, max_tokens):
+    """Spans from the end of window to repeat at the start of the next chunk"""
+    kept = []
+    kept_size = 0
+    for previous in reversed(window):
+        if kept_size + previous[2] > overlap_tokens:
+            break
+        kept.insert(0, previous)
+        kept_size += previous[2]
+    if kept or overlap_tokens <= 0:
+        return kept
+    # No whole sentence fits overlap_tokens. Repeating the last sentence whole
+    # keeps the next chunk starting on a sentence; only a sentence longer than
+    # half a chunk is cut down to its trailing words.
+    if window[-1][2] <= max_tokens // 2:
+        return [window[-1]]
+    tail = _word_tail(text, window[-1][0], window[-1][1], overlap_tokens)
+    return [tail] if tail[2] else []
+
+def chunk_pages(pages, doc_id=None, max_tokens=128, overlap_tokens=16):
+    """Lazily pack (page_number, text) pairs into overlapping ChunkRecords.
+
+    Chunks are built from whole sentences up to max_tokens (approximate),
+    and each new chunk repeats up to overlap_tokens of trailing sentences
+    from the previous one. When the last sentence alone is longer than
+    that, it is repeated whole if it is at most half a chunk, otherwise its
+    trailing words are. A chunk never spans two pages; start/end are
+    character offsets into the page text.
+    """
+    # Imported here: models.embeddings loads NumPy, which only indexing needs
+    from models.embeddings import make_chunk_record
+
+    for page_number, text in pages:
+        window = []
+        size = 0
+        for span in _iter_sentence_spans(text, max_tokens):
+            if window and size + span[2] > max_tokens:
+                yield make_chunk_record(text[window[0][0]:window[-1][1]], doc_id, page_number, window[0][0])
+                kept = _overlap(text, window, overlap_tokens, max_tokens)
+                kept_size = sum(previous[2] for previous in kept)
+                if kept_size + span[2] > max_tokens:
+                    # The sentence overlap leaves no room; fall back to a few trailing words
+                    tail = _word_tail(text, window[-1][0], window[-1][1], min(overlap_tokens, max_tokens - span[2]))
+                    kept, kept_size = ([tail], tail[2]) if tail[2] else ([], 0)
+                window, size = kept, kept_size
+            window.append(span)
+            size += span[2]
+        if window:
+            yield make_chunk_record(text[window[0][0]:window[-1][1]], doc_id, page_number, window[0][0])
+
+def split_text_into_chunks(text, chunk_size=500):
+    """Split text into chunks of approximately chunk_size characters"""
+    return [chunk for _, chunk in split_pages_into_chunks([(1, text)], chunk_size)]
 
 def retrieve_relevant_chunks(query, embedding_model):
     """Retrieve relevant document chunks using the embedding model"""
@@ -0,0 +1,11 @@
+# utils/tokens.py
+# No imports on purpose: the scheduler and the conversation window budget
+# prompts with this and should not pull in the retrieval stack to do it.
+
+# Rough English average; good enough to budget prompts without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Approximate token count (about CHARS_PER_TOKEN characters per token)"""
+    return max(1, -(-len(text) // CHARS_PER_TOKEN))
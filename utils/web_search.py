@@ -1,33 +1,146 @@
-import requests
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
 from config.config import load_config
+from utils import http_client
 import json
 
-def web_search(query, num_results=3):
-    config = load_config()
-    api_key = config.get("serper_api_key")
-    
-    if not api_key:
-        return "Web search is not configured properly."
-    
-    url = "https://google.serper.dev/search"
+SERPER_URL = "https://google.serper.dev/search"
+
+_config = None
+
+
+def _get_config():
+    # Environment is read once per process, not on every search
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SearchCache:
+    """TTL + LRU cache that coalesces concurrent identical lookups (single-flight).
+
+    The first caller for a key runs fetch(); callers arriving while it is in
+    flight wait for that result instead of sending their own request.
+    Failures are shared with the waiters but never cached.
+    """
+
+    def __init__(self, max_entries=256, ttl=300, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._in_flight = {}
+
+    def get_or_fetch(self, key, fetch):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fetch()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if flight.error is None:
+                    self._entries[key] = (self.clock(), flight.value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            flight.done.set()
+        return flight.value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = _get_config()
+                _cache = SearchCache(
+                    max_entries=config.get("web_search_cache_size", 256),
+                    ttl=config.get("web_search_ttl", 300),
+                )
+    return _cache
+
+
+def _fetch_organic(query, api_key):
+    """One Serper round trip; returns [(title, snippet), ...] or raises"""
     payload = json.dumps({"q": query})
     headers = {
         'X-API-KEY': api_key,
         'Content-Type': 'application/json'
     }
-    
+    response = http_client.post(SERPER_URL, headers=headers, data=payload, timeout=(3.05, 10))
+    response.raise_for_status()
+    results = response.json()
+    return [(result['title'], result['snippet']) for result in results.get('organic', [])]
+
+
+def web_search_results(query, num_results=3):
+    """Top organic results as "title: snippet" strings; raises if search is unavailable"""
+    api_key = _get_config().get("serper_api_key")
+    if not api_key:
+        raise RuntimeError("Web search is not configured properly.")
+
+    key = " ".join(query.lower().split())
+    organic = get_search_cache().get_or_fetch(key, lambda: _fetch_organic(query, api_key))
+    return [f"{title}: {snippet}" for title, snippet in organic[:num_results]]
+
+
+def web_search(query, num_results=3):
+    if not _get_config().get("serper_api_key"):
+        return "Web search is not configured properly."
+
     try:
-        response = requests.post(url, headers=headers, data=payload)
-        response.raise_for_status()
-        results = response.json()
-        
-        # Extract organic search results
-        search_results = []
-        if 'organic' in results:
-            for result in results['organic'][:num_results]:
-                search_results.append(f"{result['title']}: {result['snippet']}")
-        
+        search_results = web_search_results(query, num_results)
         return "\n".join(search_results) if search_results else "No relevant web results found."
-    
+
     except Exception as e:
-        return f"Error performing web search: {str(e)}"
\ No newline at end of file
+        return f"Error performing web search: {str(e)}"
+
+
+async def web_search_async(query, num_results=3):
+    """web_search on a worker thread, so it can be awaited alongside retrieval"""
+    return await asyncio.to_thread(web_search, query, num_results)